@@ -283,6 +283,112 @@ EXCEPTION
 END;
 /
 
+-- ----------------------------------------------------------------------------
+-- 7b. PROCEDIMIENTO: Sincronización en bloque desde /api/export
+-- ----------------------------------------------------------------------------
+-- Una sola llamada HTTP trae todos los outcomes con indicadores, niveles y conteos.
+-- Se guarda `last_modified` para que la siguiente ejecución pida sólo los outcomes
+-- con evaluaciones modificadas desde entonces (`?since=`). El modo incremental no ve
+-- cambios del catálogo (outcomes o indicadores nuevos o renombrados) ni outcomes sin
+-- evaluaciones: con `p_full => TRUE` se pide la exportación completa (ver job diario).
+
+CREATE TABLE apex_sync_state (
+    id NUMBER PRIMARY KEY,
+    last_modified NUMBER
+);
+
+INSERT INTO apex_sync_state (id, last_modified) VALUES (1, NULL);
+
+CREATE OR REPLACE PROCEDURE sync_outcomes_from_export(
+    p_api_key VARCHAR2 DEFAULT NULL,
+    p_full BOOLEAN DEFAULT FALSE
+)
+IS
+    l_response CLOB;
+    l_endpoint VARCHAR2(200) := '/api/export';
+    l_since NUMBER;
+BEGIN
+    APEX_DEBUG.INFO('Starting sync_outcomes_from_export');
+    
+    -- 1. Pedir sólo lo modificado desde la última sincronización (o todo con p_full)
+    SELECT last_modified INTO l_since FROM apex_sync_state WHERE id = 1;
+    IF l_since IS NOT NULL AND NOT p_full THEN
+        l_endpoint := l_endpoint || '?since=' || l_since;
+    END IF;
+    
+    l_response := fetch_api_endpoint(l_endpoint, p_api_key);
+    
+    -- 2. Procesar cada outcome exportado
+    FOR outcome IN (
+        SELECT 
+            jt.outcome_id,
+            jt.so_number,
+            jt.description,
+            jt.description_es,
+            jt.compliance_percentage,
+            jt.total_students,
+            jt.outcome_json
+        FROM JSON_TABLE(
+            l_response, '$.outcomes[*]'
+            COLUMNS (
+                outcome_id NUMBER PATH '$.outcome_id',
+                so_number VARCHAR2(50) PATH '$.so_number',
+                description CLOB PATH '$.description',
+                description_es CLOB PATH '$.description_es',
+                compliance_percentage NUMBER PATH '$.compliance.percentage',
+                total_students NUMBER PATH '$.students.total',
+                outcome_json CLOB FORMAT JSON PATH '$'
+            )
+        ) jt
+    ) LOOP
+        MERGE INTO apex_student_outcomes dst
+        USING (
+            SELECT 
+                outcome.outcome_id as id,
+                outcome.so_number as so_number,
+                outcome.description as description_en,
+                outcome.description_es as description_es,
+                outcome.compliance_percentage as compliance_percentage,
+                outcome.total_students as total_students,
+                outcome.outcome_json as json_data
+            FROM dual
+        ) src
+        ON (dst.id = src.id)
+        WHEN MATCHED THEN
+            UPDATE SET 
+                dst.so_number = src.so_number,
+                dst.description_en = src.description_en,
+                dst.description_es = src.description_es,
+                dst.compliance_percentage = src.compliance_percentage,
+                dst.total_students = src.total_students,
+                dst.json_data = src.json_data,
+                dst.last_sync = SYSTIMESTAMP
+        WHEN NOT MATCHED THEN
+            INSERT (id, so_number, description_en, description_es, 
+                    compliance_percentage, total_students, json_data)
+            VALUES (src.id, src.so_number, src.description_en, src.description_es,
+                    src.compliance_percentage, src.total_students, src.json_data);
+        
+        -- 3. Los indicadores tienen el mismo formato que en /api/outcome-report
+        sync_indicators_from_json(outcome.outcome_id, outcome.outcome_json);
+    END LOOP;
+    
+    -- 4. Guardar la marca de agua para la siguiente ejecución
+    UPDATE apex_sync_state
+    SET last_modified = JSON_VALUE(l_response, '$.last_modified' RETURNING NUMBER)
+    WHERE id = 1;
+    
+    COMMIT;
+    APEX_DEBUG.INFO('Export sync completed successfully');
+    
+EXCEPTION
+    WHEN OTHERS THEN
+        ROLLBACK;
+        APEX_DEBUG.ERROR('Error in sync_outcomes_from_export: ' || SQLERRM);
+        RAISE;
+END;
+/
+
 -- ----------------------------------------------------------------------------
 -- 8. JOB: Sincronización Automática (Cada 1 hora)
 -- ----------------------------------------------------------------------------
@@ -291,7 +397,7 @@ BEGIN
     DBMS_SCHEDULER.CREATE_JOB (
         job_name => 'SYNC_OUTCOMES_JOB',
         job_type => 'PLSQL_BLOCK',
-        job_action => 'BEGIN sync_outcomes_from_api(); END;',
+        job_action => 'BEGIN sync_outcomes_from_export(); END;',
         start_date => SYSTIMESTAMP,
         repeat_interval => 'FREQ=HOURLY; INTERVAL=1',
         enabled => TRUE,
@@ -300,6 +406,22 @@ BEGIN
 END;
 /
 
+-- Exportación completa diaria: el job horario es incremental y sólo ve evaluaciones
+-- modificadas; ésta trae también outcomes e indicadores nuevos o renombrados y los
+-- outcomes que aún no tienen evaluaciones.
+BEGIN
+    DBMS_SCHEDULER.CREATE_JOB (
+        job_name => 'SYNC_OUTCOMES_FULL_JOB',
+        job_type => 'PLSQL_BLOCK',
+        job_action => 'BEGIN sync_outcomes_from_export(p_full => TRUE); END;',
+        start_date => SYSTIMESTAMP,
+        repeat_interval => 'FREQ=DAILY; BYHOUR=2; BYMINUTE=0',
+        enabled => TRUE,
+        comments => 'Sincronización completa (incluye cambios del catálogo) cada día'
+    );
+END;
+/
+
 -- ----------------------------------------------------------------------------
 -- 9. QUERY PARA APEX CARDS REGION
 -- ----------------------------------------------------------------------------
@@ -431,6 +553,7 @@ END;
 -- ----------------------------------------------------------------------------
 
 GRANT EXECUTE ON sync_outcomes_from_api TO APEX_PUBLIC_USER;
+GRANT EXECUTE ON sync_outcomes_from_export TO APEX_PUBLIC_USER;
 GRANT EXECUTE ON fetch_api_endpoint TO APEX_PUBLIC_USER;
 GRANT EXECUTE ON export_outcome_pdf TO APEX_PUBLIC_USER;
 
@@ -448,6 +571,18 @@ BEGIN
 END;
 /
 
+-- Sincronización en bloque (sólo cambios desde la última ejecución)
+BEGIN
+    sync_outcomes_from_export(p_api_key => 'tu_api_key');
+END;
+/
+
+-- Sincronización en bloque completa (tras cambiar outcomes o indicadores en Moodle)
+BEGIN
+    sync_outcomes_from_export(p_api_key => 'tu_api_key', p_full => TRUE);
+END;
+/
+
 -- Ver resultados
 SELECT * FROM v_outcomes_dashboard;
 SELECT * FROM v_chart_eg_performance WHERE outcome_id = 1;
@@ -0,0 +1,273 @@
+# Benchmark de la API contra el dataset de benchmark_seed.py
+# Ejecuta cada endpoint con clientes concurrentes y mide latencia (p50/p95/p99), throughput
+# y, leyendo /metrics antes y después de cada escenario, consultas SQL y tiempo en BD por
+# petición. Los resultados se guardan en JSON; con --compare se contrastan con una ejecución
+# anterior y el script termina con código 1 si algún escenario empeora más del umbral.
+#
+# Tras el calentamiento, assessment, chart y reporte salen de la caché de payloads y de las
+# estadísticas materializadas: se mide la caché, no las consultas. Con --cold cada petición de
+# esos escenarios lleva un filtro `to` distinto, así no puede servirse de ninguna de las dos y
+# se mide la agregación en la BD. Batch y exportación no admiten filtros y se miden igual.
+#
+# Ejemplo:
+#   python benchmark.py --api-key TU_API_KEY --admin-key TU_ADMIN_KEY --concurrency 8 --requests 200
+#   python benchmark.py --cold --compare benchmark_results/20240101-120000.json
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+METRIC_LINE = re.compile(r'^(\w+)\{method="(\w+)",route="((?:[^"\\]|\\.)*)"\} ([0-9.eE+-]+)$')
+COLD_PREFIXES = ("/api/outcome-assessment/", "/api/outcome-chart/", "/api/outcome-report/")
+FAR_FUTURE = 4102444800  # 2100-01-01: un `to` que no excluye ninguna evaluación
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de los endpoints de la API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY", ""))
+    parser.add_argument("--admin-key", default=os.getenv("ADMIN_API_KEY", os.getenv("API_KEY", "")))
+    parser.add_argument("--fixture", default="benchmark_fixture.json")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones medidas por escenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Peticiones previas sin medir por escenario")
+    parser.add_argument("--cold", action="store_true", help="Evitar las cachés en assessment, chart y reporte con un filtro distinto por petición")
+    parser.add_argument("--only", default=None, help="Ejecutar sólo los escenarios cuyo nombre contenga este texto")
+    parser.add_argument("--output-dir", default="benchmark_results")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento relativo de p95 que se considera regresión")
+    return parser.parse_args()
+
+def build_scenarios(fixture):
+    """Escenarios `(nombre, path)` que cubren todos los endpoints con ids del fixture"""
+    outcome = fixture["outcome_ids"][0]
+    indicator = fixture["indicator_ids"][0]
+    student = fixture["student_ids"][0]
+    course = fixture["course_ids"][0]
+    teacher = fixture["teacher_ids"][0]
+    teacher_name = fixture["teacher_names"][0]
+    program = fixture["programs"][0]
+    time_from, time_to = fixture["time_window"]
+    return [
+        ("health", "/health"),
+        ("health_ready", "/health/ready"),
+        ("outcomes", "/api/outcomes"),
+        ("outcomes_teacher_id", f"/api/outcomes?teacher_id={teacher}"),
+        ("outcomes_teacher_name", f"/api/outcomes?teacher_name={teacher_name}"),
+        ("indicators", f"/api/indicators/{outcome}"),
+        ("levels", f"/api/levels/{indicator}"),
+        ("evaluations", f"/api/evaluations/{student}"),
+        ("evaluations_page", f"/api/evaluations/{student}?limit=50"),
+        ("evaluations_ndjson", f"/api/evaluations/{student}?format=ndjson"),
+        ("outcome_summary", f"/api/outcome-summary/{outcome}"),
+        ("outcome_assessment", f"/api/outcome-assessment/{outcome}"),
+        ("outcome_assessment_course", f"/api/outcome-assessment/{outcome}?courseid={course}"),
+        ("outcome_assessment_term", f"/api/outcome-assessment/{outcome}?from={time_from}&to={time_to}"),
+        ("outcome_assessment_program", f"/api/outcome-assessment/{outcome}?program={program}"),
+        ("outcome_chart", f"/api/outcome-chart/{outcome}"),
+        ("outcome_report", f"/api/outcome-report/{outcome}"),
+        ("outcome_report_course", f"/api/outcome-report/{outcome}?courseid={course}"),
+        ("outcomes_batch", "/api/outcomes-batch?ids=all"),
+        ("export", "/api/export"),
+    ]
+
+def cold_path(path, iteration):
+    """`path` con `to` desplazado `iteration` segundos: una clave de caché nueva en cada petición.
+
+    Sin `to` en el escenario se parte de FAR_FUTURE y la respuesta es la misma que sin filtro.
+    """
+    if not path.startswith(COLD_PREFIXES):
+        return path
+    parts = urlsplit(path)
+    query = dict(parse_qsl(parts.query))
+    query["to"] = str(int(query.get("to", FAR_FUTURE)) + iteration)
+    return f"{parts.path}?{urlencode(query)}"
+
+def percentile(ordered, fraction):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def read_metrics(session, base_url, admin_key):
+    """Totales de consultas, tiempo en BD y CPU del servidor de /metrics (excluye la propia ruta /metrics)"""
+    response = session.get(f"{base_url}/metrics", headers={"X-API-Key": admin_key} if admin_key else {})
+    if response.status_code != 200:
+        return None
+    queries, db_seconds, cpu_seconds = 0.0, 0.0, None
+    for line in response.text.splitlines():
+        if line.startswith("process_cpu_seconds_total "):
+            cpu_seconds = float(line.split()[1])
+            continue
+        match = METRIC_LINE.match(line)
+        if not match or match.group(3) == "/metrics":
+            continue
+        name, value = match.group(1), float(match.group(4))
+        if name == "abet_db_queries_total":
+            queries += value
+        elif name == "abet_db_request_duration_seconds_sum":
+            db_seconds += value
+    return queries, db_seconds, cpu_seconds
+
+def run_scenario(args, headers, name, path):
+    local = threading.local()
+
+    def url(iteration):
+        return f"{args.base_url}{cold_path(path, iteration) if args.cold else path}"
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def one_request(iteration):
+        start = time.perf_counter()
+        try:
+            response = session().get(url(iteration), headers=headers)
+            response.content
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = "error"
+        return time.perf_counter() - start, status
+
+    warmup_session = requests.Session()
+    for iteration in range(args.warmup):
+        # En modo frío el calentamiento usa filtros que no se repiten en las peticiones medidas
+        warmup_session.get(url(args.requests + iteration), headers=headers)
+    before = read_metrics(warmup_session, args.base_url, args.admin_key)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        samples = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    after = read_metrics(warmup_session, args.base_url, args.admin_key)
+    durations = sorted(duration for duration, _ in samples)
+    status_codes = {}
+    for _, status in samples:
+        status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+    result = {
+        "name": name,
+        "path": path,
+        "cache_busted": args.cold and path.startswith(COLD_PREFIXES),
+        "requests": len(samples),
+        "errors": sum(count for status, count in status_codes.items() if not status.startswith("2")),
+        "status_codes": status_codes,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 2),
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 2),
+        "max_ms": round(durations[-1] * 1000, 2),
+        "queries_per_request": None,
+        "db_ms_per_request": None,
+        "cpu_ms_per_request": None,
+    }
+    if before is not None and after is not None:
+        result["queries_per_request"] = round((after[0] - before[0]) / len(samples), 2)
+        result["db_ms_per_request"] = round((after[1] - before[1]) / len(samples) * 1000, 2)
+        if before[2] is not None and after[2] is not None:
+            # Incluye también la lectura de /metrics y las tareas de fondo; sirve para comparar ejecuciones
+            result["cpu_ms_per_request"] = round((after[2] - before[2]) / len(samples) * 1000, 2)
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, config, baseline_path, threshold):
+    """Imprime la comparación de p95 y retorna los escenarios que empeoraron más del umbral"""
+    with open(baseline_path, encoding="utf-8") as f:
+        previous_run = json.load(f)
+    baseline = {r["name"]: r for r in previous_run["results"]}
+    regressions = []
+    print()
+    print(f"📊 Comparación con {baseline_path} (umbral p95 +{threshold:.0%})")
+    if (previous_run["concurrency"], previous_run["fixture"]) != (config["concurrency"], config["fixture"]):
+        print("   ⚠️  La ejecución anterior usó otra concurrencia o dataset; la comparación es orientativa")
+    if previous_run.get("cold", False) != config["cold"]:
+        print("   ⚠️  Sólo una de las dos ejecuciones usó --cold: caché contra BD, la comparación no es válida")
+    for result in results:
+        previous = baseline.get(result["name"])
+        if not previous or not previous["p95_ms"]:
+            continue
+        change = (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"]
+        flag = "❌" if change > threshold else "✅"
+        queries = ""
+        if result["queries_per_request"] is not None and previous.get("queries_per_request") is not None:
+            queries = f", consultas {previous['queries_per_request']} -> {result['queries_per_request']}"
+        if result.get("cpu_ms_per_request") is not None and previous.get("cpu_ms_per_request") is not None:
+            queries += f", CPU {previous['cpu_ms_per_request']} -> {result['cpu_ms_per_request']} ms"
+        print(f"   {flag} {result['name']}: p95 {previous['p95_ms']} -> {result['p95_ms']} ms ({change:+.0%}){queries}")
+        if change > threshold:
+            regressions.append(result["name"])
+    return regressions
+
+def main():
+    args = parse_args()
+    with open(args.fixture, encoding="utf-8") as f:
+        fixture = json.load(f)
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+
+    print("=" * 60)
+    print("  BENCHMARK: Endpoints de la API")
+    print("=" * 60)
+    print(f"   {args.concurrency} clientes, {args.requests} peticiones por escenario, "
+          f"{fixture['scale']['evaluations']} evaluaciones en el dataset"
+          + (", sin cachés de payloads (--cold)" if args.cold else ""))
+    print()
+
+    results = []
+    try:
+        for name, path in build_scenarios(fixture):
+            if args.only and args.only not in name:
+                continue
+            result = run_scenario(args, headers, name, path)
+            results.append(result)
+            queries = "" if result["queries_per_request"] is None else f", {result['queries_per_request']} consultas/petición"
+            if result["cpu_ms_per_request"] is not None:
+                queries += f", {result['cpu_ms_per_request']} ms CPU/petición"
+            print(f"   - {name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+                  f"{result['throughput_rps']} req/s{queries}"
+                  + (f", {result['errors']} errores" if result["errors"] else ""))
+    except requests.exceptions.ConnectionError:
+        print("❌ No se pudo conectar al servidor")
+        print("   Ejecuta: uvicorn main:app")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output = os.path.join(args.output_dir, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    run = {
+        "timestamp": int(time.time()),
+        "git_revision": git_revision(),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "requests_per_scenario": args.requests,
+        "cold": args.cold,
+        "fixture": {"seed": fixture["seed"], "scale": fixture["scale"], "indexes": fixture["indexes"]},
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print()
+    print(f"💾 Resultados guardados en {output}")
+
+    if args.compare:
+        regressions = compare(results, run, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ Regresiones: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,320 @@
+# Generador del dataset sintético para el benchmark
+# Crea en una base de datos MySQL local las tablas de Moodle que usa la API (outcomes,
+# indicadores, niveles, evaluaciones, usuarios, cursos y roles) y las llena con datos
+# reproducibles: la misma semilla y escala producen siempre las mismas filas.
+#
+# Ejemplo:
+#   docker run -d --name abet-bench -e MYSQL_ROOT_PASSWORD=bench -p 3307:3306 mysql:8
+#   python benchmark_seed.py --port 3307 --user root --password bench --evaluations 2000000
+#
+# Al terminar escribe benchmark_fixture.json con la escala y los ids que usa benchmark.py.
+
+import argparse
+import json
+import random
+import time
+
+import mysql.connector
+
+# Títulos de los niveles (en orden de sortorder descendente) y peso de cada nivel al generar evaluaciones
+LEVELS = [
+    ("Excellent", "Excelente", 25),
+    ("Good", "Bueno", 35),
+    ("Fair", "Regular", 25),
+    ("Inadequate", "Inadecuado", 15),
+]
+PROGRAMS = ["ISIS", "IIND", "ICIV", "IMEC", "IELE", "IAMB"]
+FIRST_NAMES = ["José", "Ana", "María", "Luis", "Andrés", "Camila", "Sofía", "Juan", "Valentina", "Mateo", "Lucía", "Diego"]
+LAST_NAMES = ["Pérez", "Gómez", "Rodríguez", "Martínez", "Hernández", "López", "Díaz", "Torres", "Ramírez", "Núñez"]
+TERM_SECONDS = 182 * 24 * 3600
+START_TIMESTAMP = 1640995200  # 2022-01-01 UTC
+TEACHER_ROLE_ID = 3
+STUDENT_ROLE_ID = 5
+COURSE_CONTEXT_LEVEL = 50
+
+SCHEMA = [
+    """CREATE TABLE mdl_gradingform_utb_outcomes (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        so_number VARCHAR(20) NOT NULL,
+        description_en LONGTEXT,
+        description_es LONGTEXT,
+        timecreated BIGINT(10) NOT NULL DEFAULT 0,
+        timemodified BIGINT(10) NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE mdl_gradingform_utb_indicators (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        student_outcome_id BIGINT(10) NOT NULL,
+        indicator_letter VARCHAR(5) NOT NULL,
+        description_en LONGTEXT,
+        description_es LONGTEXT,
+        timecreated BIGINT(10) NOT NULL DEFAULT 0,
+        timemodified BIGINT(10) NOT NULL DEFAULT 0,
+        KEY abet_ind_outcome (student_outcome_id)
+    )""",
+    """CREATE TABLE mdl_gradingform_utb_lvl (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        indicator_id BIGINT(10) NOT NULL,
+        title_en VARCHAR(255),
+        title_es VARCHAR(255),
+        description_en LONGTEXT,
+        description_es LONGTEXT,
+        minscore DECIMAL(10,5) NOT NULL DEFAULT 0,
+        maxscore DECIMAL(10,5) NOT NULL DEFAULT 0,
+        sortorder BIGINT(10) NOT NULL DEFAULT 0,
+        KEY abet_lvl_indicator (indicator_id)
+    )""",
+    """CREATE TABLE mdl_gradingform_utb_evaluations (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        instanceid BIGINT(10) NOT NULL,
+        studentid BIGINT(10) NOT NULL,
+        courseid BIGINT(10) NOT NULL,
+        activityid BIGINT(10) NOT NULL,
+        activityname VARCHAR(255),
+        student_outcome_id BIGINT(10) NOT NULL,
+        indicator_id BIGINT(10) NOT NULL,
+        performance_level_id BIGINT(10) NOT NULL,
+        score DECIMAL(10,5),
+        feedback LONGTEXT,
+        timecreated BIGINT(10) NOT NULL,
+        timemodified BIGINT(10) NOT NULL,
+        KEY abet_eval_indicator (indicator_id, performance_level_id)
+    )""",
+    """CREATE TABLE mdl_course (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        fullname VARCHAR(254) NOT NULL
+    )""",
+    """CREATE TABLE mdl_context (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        contextlevel BIGINT(10) NOT NULL,
+        instanceid BIGINT(10) NOT NULL,
+        KEY abet_ctx_instance (contextlevel, instanceid)
+    )""",
+    """CREATE TABLE mdl_role (
+        id BIGINT(10) NOT NULL PRIMARY KEY,
+        shortname VARCHAR(100) NOT NULL
+    )""",
+    """CREATE TABLE mdl_role_assignments (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        roleid BIGINT(10) NOT NULL,
+        contextid BIGINT(10) NOT NULL,
+        userid BIGINT(10) NOT NULL,
+        KEY abet_ra_context (contextid, roleid),
+        KEY abet_ra_user (userid)
+    )""",
+    """CREATE TABLE mdl_user (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        firstname VARCHAR(100) NOT NULL,
+        lastname VARCHAR(100) NOT NULL,
+        idnumber VARCHAR(255) NOT NULL DEFAULT '',
+        department VARCHAR(255) NOT NULL DEFAULT ''
+    )""",
+    """CREATE TABLE mdl_user_info_field (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        shortname VARCHAR(255) NOT NULL,
+        name LONGTEXT NOT NULL
+    )""",
+    """CREATE TABLE mdl_user_info_data (
+        id BIGINT(10) NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        userid BIGINT(10) NOT NULL,
+        fieldid BIGINT(10) NOT NULL,
+        data LONGTEXT NOT NULL,
+        KEY abet_info_user (userid, fieldid)
+    )""",
+]
+
+# Índices recomendados en el README para los endpoints de estadísticas
+RECOMMENDED_INDEXES = [
+    "CREATE INDEX abet_eval_timemodified ON mdl_gradingform_utb_evaluations (timemodified, indicator_id)",
+    "CREATE INDEX abet_eval_student_time ON mdl_gradingform_utb_evaluations (studentid, timecreated, id)",
+    "CREATE INDEX abet_eval_ind_course ON mdl_gradingform_utb_evaluations (indicator_id, courseid, timecreated, performance_level_id)",
+    "CREATE INDEX abet_eval_ind_time ON mdl_gradingform_utb_evaluations (indicator_id, timecreated, performance_level_id)",
+    "CREATE INDEX abet_info_field_data ON mdl_user_info_data (fieldid, data(64), userid)",
+]
+
+TABLES = [
+    "mdl_gradingform_utb_outcomes", "mdl_gradingform_utb_indicators", "mdl_gradingform_utb_lvl",
+    "mdl_gradingform_utb_evaluations", "mdl_course", "mdl_context", "mdl_role", "mdl_role_assignments",
+    "mdl_user", "mdl_user_info_field", "mdl_user_info_data",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Genera el dataset sintético de Moodle para el benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="abet_bench", help="Base de datos de benchmark (se crea si no existe)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--outcomes", type=int, default=7)
+    parser.add_argument("--indicators", type=int, default=4, help="Indicadores por outcome")
+    parser.add_argument("--courses", type=int, default=60)
+    parser.add_argument("--teachers", type=int, default=80)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--courses-per-student", type=int, default=6)
+    parser.add_argument("--evaluations", type=int, default=1000000)
+    parser.add_argument("--terms", type=int, default=6, help="Semestres sobre los que se reparten las evaluaciones")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--no-indexes", action="store_true", help="No crear los índices recomendados del README")
+    parser.add_argument("--fixture", default="benchmark_fixture.json")
+    return parser.parse_args()
+
+def insert_rows(conn, table, columns, rows, batch_size):
+    """Insertar `rows` (iterable) en bloques; retorna el número de filas"""
+    cursor = conn.cursor()
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    batch, total = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    cursor.close()
+    return total
+
+def reset_schema(conn):
+    cursor = conn.cursor()
+    for table in TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    for ddl in SCHEMA:
+        cursor.execute(ddl)
+    cursor.close()
+
+def seed(conn, args):
+    rng = random.Random(args.seed)
+    now = START_TIMESTAMP + args.terms * TERM_SECONDS
+
+    # Catálogo de rúbricas
+    outcome_rows, indicator_rows, level_rows = [], [], []
+    indicators_by_outcome, levels_by_indicator = {}, {}
+    indicator_id, level_id = 1, 1
+    for outcome_id in range(1, args.outcomes + 1):
+        outcome_rows.append((outcome_id, f"SO{outcome_id}", f"Student outcome {outcome_id}", f"Resultado de aprendizaje {outcome_id}", START_TIMESTAMP, START_TIMESTAMP))
+        indicators_by_outcome[outcome_id] = []
+        for k in range(args.indicators):
+            letter = chr(ord("a") + k)
+            indicator_rows.append((indicator_id, outcome_id, letter, f"Indicator {outcome_id}{letter}", f"Indicador {outcome_id}{letter}", START_TIMESTAMP, START_TIMESTAMP))
+            indicators_by_outcome[outcome_id].append(indicator_id)
+            levels_by_indicator[indicator_id] = []
+            for position, (title_en, title_es, _) in enumerate(LEVELS):
+                level_rows.append((level_id, indicator_id, title_en, title_es, f"{title_en} performance", f"Desempeño {title_es.lower()}",
+                                   len(LEVELS) - position - 1, len(LEVELS) - position, len(LEVELS) - position))
+                levels_by_indicator[indicator_id].append(level_id)
+                level_id += 1
+            indicator_id += 1
+    insert_rows(conn, "mdl_gradingform_utb_outcomes", ["id", "so_number", "description_en", "description_es", "timecreated", "timemodified"], outcome_rows, args.batch_size)
+    insert_rows(conn, "mdl_gradingform_utb_indicators", ["id", "student_outcome_id", "indicator_letter", "description_en", "description_es", "timecreated", "timemodified"], indicator_rows, args.batch_size)
+    insert_rows(conn, "mdl_gradingform_utb_lvl", ["id", "indicator_id", "title_en", "title_es", "description_en", "description_es", "minscore", "maxscore", "sortorder"], level_rows, args.batch_size)
+
+    # Cursos y outcomes evaluados en cada uno
+    course_ids = list(range(1, args.courses + 1))
+    insert_rows(conn, "mdl_course", ["id", "fullname"], ((cid, f"Curso {cid}") for cid in course_ids), args.batch_size)
+    insert_rows(conn, "mdl_context", ["id", "contextlevel", "instanceid"], ((cid, COURSE_CONTEXT_LEVEL, cid) for cid in course_ids), args.batch_size)
+    outcome_ids = list(indicators_by_outcome)
+    outcomes_by_course = {cid: rng.sample(outcome_ids, rng.randint(1, min(3, len(outcome_ids)))) for cid in course_ids}
+
+    # Usuarios: primero profesores y luego estudiantes
+    insert_rows(conn, "mdl_role", ["id", "shortname"], [(TEACHER_ROLE_ID, "editingteacher"), (STUDENT_ROLE_ID, "student")], args.batch_size)
+    teacher_ids = list(range(1, args.teachers + 1))
+    student_ids = list(range(args.teachers + 1, args.teachers + args.students + 1))
+    user_rows = []
+    for uid in teacher_ids + student_ids:
+        user_rows.append((uid, rng.choice(FIRST_NAMES), f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}", f"U{uid:07d}", ""))
+    insert_rows(conn, "mdl_user", ["id", "firstname", "lastname", "idnumber", "department"], user_rows, args.batch_size)
+    insert_rows(conn, "mdl_user_info_field", ["id", "shortname", "name"], [(1, "programa", "Programa")], args.batch_size)
+    program_by_student = {uid: rng.choice(PROGRAMS) for uid in student_ids}
+    insert_rows(conn, "mdl_user_info_data", ["userid", "fieldid", "data"], ((uid, 1, program) for uid, program in program_by_student.items()), args.batch_size)
+
+    # Asignaciones de rol: 1-2 profesores por curso y los estudiantes en sus cursos
+    courses_by_student = {uid: rng.sample(course_ids, min(args.courses_per_student, len(course_ids))) for uid in student_ids}
+    def role_assignments():
+        for cid in course_ids:
+            for teacher in rng.sample(teacher_ids, min(rng.randint(1, 2), len(teacher_ids))):
+                yield (TEACHER_ROLE_ID, cid, teacher)
+        for uid, courses in courses_by_student.items():
+            for cid in courses:
+                yield (STUDENT_ROLE_ID, cid, uid)
+    insert_rows(conn, "mdl_role_assignments", ["roleid", "contextid", "userid"], role_assignments(), args.batch_size)
+
+    # Evaluaciones repartidas entre los semestres, con niveles según LEVELS
+    level_weights = [weight for _, _, weight in LEVELS]
+    def evaluations():
+        for n in range(args.evaluations):
+            student = rng.choice(student_ids)
+            course = rng.choice(courses_by_student[student])
+            outcome = rng.choice(outcomes_by_course[course])
+            indicator = rng.choice(indicators_by_outcome[outcome])
+            position = rng.choices(range(len(LEVELS)), weights=level_weights)[0]
+            created = START_TIMESTAMP + rng.randrange(args.terms * TERM_SECONDS)
+            # Una parte de las evaluaciones se recalifica más tarde
+            modified = created + rng.randrange(30 * 24 * 3600) if rng.random() < 0.1 else created
+            activity = course * 100 + rng.randrange(10)
+            yield (activity, student, course, activity, f"Actividad {activity}", outcome, indicator,
+                   levels_by_indicator[indicator][position], len(LEVELS) - position, None, created, min(modified, now))
+    start = time.perf_counter()
+    total = insert_rows(conn, "mdl_gradingform_utb_evaluations",
+                        ["instanceid", "studentid", "courseid", "activityid", "activityname", "student_outcome_id", "indicator_id",
+                         "performance_level_id", "score", "feedback", "timecreated", "timemodified"],
+                        evaluations(), args.batch_size)
+    print(f"   - {total} evaluaciones en {time.perf_counter() - start:.1f} s")
+
+    return {
+        "seed": args.seed,
+        "scale": {
+            "outcomes": args.outcomes,
+            "indicators_per_outcome": args.indicators,
+            "courses": args.courses,
+            "teachers": args.teachers,
+            "students": args.students,
+            "evaluations": args.evaluations,
+            "terms": args.terms,
+        },
+        "outcome_ids": outcome_ids,
+        "indicator_ids": [row[0] for row in indicator_rows],
+        "course_ids": course_ids,
+        "student_ids": rng.sample(student_ids, min(50, len(student_ids))),
+        "teacher_ids": teacher_ids[:10],
+        "teacher_names": sorted({row[1] for row in user_rows[:len(teacher_ids)]})[:5],
+        "programs": PROGRAMS,
+        "time_window": [START_TIMESTAMP, START_TIMESTAMP + TERM_SECONDS - 1],
+        "indexes": not args.no_indexes,
+    }
+
+def main():
+    args = parse_args()
+    print("=" * 60)
+    print("  BENCHMARK: Generación del dataset sintético")
+    print("=" * 60)
+    conn = mysql.connector.connect(host=args.host, port=args.port, user=args.user, password=args.password)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}` CHARACTER SET utf8mb4")
+    cursor.execute(f"USE `{args.database}`")
+    cursor.close()
+
+    print(f"🔧 Recreando tablas en `{args.database}`...")
+    reset_schema(conn)
+    print("🔧 Insertando datos...")
+    fixture = seed(conn, args)
+    if not args.no_indexes:
+        print("🔧 Creando índices recomendados...")
+        cursor = conn.cursor()
+        for ddl in RECOMMENDED_INDEXES:
+            cursor.execute(ddl)
+        cursor.execute(f"ANALYZE TABLE {', '.join(TABLES)}")
+        cursor.fetchall()
+        cursor.close()
+    conn.close()
+
+    fixture["database"] = args.database
+    with open(args.fixture, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, indent=2, ensure_ascii=False)
+    print(f"✅ Dataset listo; fixture en {args.fixture}")
+    print("   Arranca la API con DB_NAME apuntando a esta base de datos y ejecuta: python benchmark.py")
+
+if __name__ == "__main__":
+    main()
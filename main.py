@@ -1,15 +1,41 @@
-from fastapi import FastAPI, HTTPException, Depends, Security, Query
+from fastapi import FastAPI, HTTPException, Depends, Security, Query, Request, Response
+from fastapi.encoders import decimal_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security.api_key import APIKeyHeader
+from starlette.datastructures import Headers, MutableHeaders
 from pydantic import BaseModel
 from typing import List, Optional
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import asyncio
+import base64
+import bisect
+import contextvars
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import json
+import logging
 import mysql.connector
 from mysql.connector import Error
 import os
+import re
+import secrets
+import threading
+import time
+import unicodedata
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger("uvicorn.error")
+
 # Seguridad
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
@@ -22,6 +48,15 @@ async def verify_api_key(api_key: str = Security(api_key_header)):
         raise HTTPException(status_code=403, detail="API Key inválida o faltante")
     return api_key
 
+async def verify_admin_key(api_key: str = Security(api_key_header)):
+    # ADMIN_API_KEY protege los endpoints de administración; si no existe se usa API_KEY
+    correct_api_key = os.getenv("ADMIN_API_KEY") or os.getenv("API_KEY")
+    if not correct_api_key:
+        return None
+    if not api_key or api_key != correct_api_key:
+        raise HTTPException(status_code=403, detail="API Key de administración inválida o faltante")
+    return api_key
+
 # App
 app = FastAPI(title="ABET Evaluation API", version="1.0.0")
 
@@ -42,16 +77,745 @@ DB_CONFIG = {
     "database": os.getenv("DB_NAME"),
 }
 
-def get_db_connection():
+# Métricas
+# Un middleware ASGI mide la latencia de cada ruta y, a través de un contextvar (que `run_db`
+# propaga a los hilos de BD), acumula por petición las consultas, el tiempo en la BD y la
+# espera por una conexión del pool. Se exponen en formato de texto de Prometheus en /metrics.
+# Con SLOW_REQUEST_MS > 0 las peticiones más lentas se registran con sus sentencias SQL.
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 0))
+SLOW_REQUEST_SQL_CHARS = 300
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos (semántica de Prometheus)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+class RequestMetrics:
+    """Consultas y tiempos de BD de una petición; se actualiza desde los hilos de `run_db`."""
+
+    def __init__(self, keep_statements):
+        self.queries = 0
+        self.db_time = 0.0
+        self.connect_time = 0.0
+        self.statements = [] if keep_statements else None
+        self._lock = threading.Lock()
+
+    def record_query(self, operation, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_time += seconds
+            if self.statements is not None:
+                self.statements.append((operation, seconds))
+
+    def record_fetch(self, seconds):
+        with self._lock:
+            self.db_time += seconds
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connect_time += seconds
+
+current_request_metrics = contextvars.ContextVar("current_request_metrics", default=None)
+
+class InstrumentedCursor:
+    """Cursor que cronometra `execute` y las lecturas para las métricas de la petición en curso."""
+
+    def __init__(self, raw, replica=None):
+        self._raw = raw
+        self.replica = replica
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def _timed(self, func, args, kwargs, operation=None):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics = current_request_metrics.get()
+            if metrics is not None:
+                elapsed = time.perf_counter() - start
+                if operation is None:
+                    metrics.record_fetch(elapsed)
+                else:
+                    metrics.record_query(operation, elapsed)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._raw.execute, (operation,) + args, kwargs, operation)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._raw.executemany, (operation,) + args, kwargs, operation)
+
+    def fetchone(self, *args, **kwargs):
+        return self._timed(self._raw.fetchone, args, kwargs)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(self._raw.fetchmany, args, kwargs)
+
+    def fetchall(self, *args, **kwargs):
+        return self._timed(self._raw.fetchall, args, kwargs)
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRegistry:
+    """Contadores e histogramas por ruta (la plantilla de la ruta, no la URL concreta)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.db_time = {}
+        self.queries = {}
+        self.connect_time = {}
+        self.slow_requests = 0
+
+    def observe(self, method, route, status, duration, metrics):
+        key = (method, route)
+        with self._lock:
+            status_key = (method, route, status)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self.latency.setdefault(key, Histogram(self.buckets)).observe(duration)
+            self.db_time.setdefault(key, Histogram(self.buckets)).observe(metrics.db_time)
+            self.queries[key] = self.queries.get(key, 0) + metrics.queries
+            self.connect_time[key] = self.connect_time.get(key, 0.0) + metrics.connect_time
+
+    def render(self, pool_stats, admission_stats=()):
+        with self._lock:
+            lines = [
+                "# HELP abet_http_requests_total Peticiones atendidas por ruta y código de estado.",
+                "# TYPE abet_http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'abet_http_requests_total{{method="{method}",route="{_label_value(route)}",status="{status}"}} {count}')
+            lines += [
+                "# HELP abet_http_request_duration_seconds Latencia total de la petición.",
+                "# TYPE abet_http_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines("abet_http_request_duration_seconds", f'method="{method}",route="{_label_value(route)}"'))
+            lines += [
+                "# HELP abet_db_request_duration_seconds Tiempo en la BD (execute y lecturas) por petición.",
+                "# TYPE abet_db_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self.db_time.items()):
+                lines.extend(histogram.lines("abet_db_request_duration_seconds", f'method="{method}",route="{_label_value(route)}"'))
+            lines += [
+                "# HELP abet_db_queries_total Sentencias SQL ejecutadas por ruta.",
+                "# TYPE abet_db_queries_total counter",
+            ]
+            for (method, route), count in sorted(self.queries.items()):
+                lines.append(f'abet_db_queries_total{{method="{method}",route="{_label_value(route)}"}} {count}')
+            lines += [
+                "# HELP abet_db_connection_wait_seconds_total Tiempo esperando una conexión del pool por ruta.",
+                "# TYPE abet_db_connection_wait_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.connect_time.items()):
+                lines.append(f'abet_db_connection_wait_seconds_total{{method="{method}",route="{_label_value(route)}"}} {seconds:.6f}')
+            lines += [
+                "# HELP abet_slow_requests_total Peticiones por encima de SLOW_REQUEST_MS.",
+                "# TYPE abet_slow_requests_total counter",
+                f"abet_slow_requests_total {self.slow_requests}",
+            ]
+        lines += [
+            "# HELP process_cpu_seconds_total Tiempo de CPU (usuario + sistema) consumido por el proceso.",
+            "# TYPE process_cpu_seconds_total counter",
+            f"process_cpu_seconds_total {time.process_time():.6f}",
+            "# HELP abet_db_pool_connections Conexiones del pool por estado.",
+            "# TYPE abet_db_pool_connections gauge",
+            f'abet_db_pool_connections{{state="in_use"}} {pool_stats["in_use"]}',
+            f'abet_db_pool_connections{{state="idle"}} {pool_stats["idle"]}',
+            f'abet_db_pool_connections{{state="open"}} {pool_stats["open"]}',
+            "# HELP abet_db_pool_capacity Conexiones máximas del pool (base + overflow).",
+            "# TYPE abet_db_pool_capacity gauge",
+            f'abet_db_pool_capacity {pool_stats["size"] + pool_stats["max_overflow"]}',
+            "# HELP abet_db_pool_timeouts_total Peticiones que agotaron la espera por una conexión.",
+            "# TYPE abet_db_pool_timeouts_total counter",
+            f'abet_db_pool_timeouts_total {pool_stats["timeouts"]}',
+        ]
+        if admission_stats:
+            lines += [
+                "# HELP abet_admission_requests Peticiones en curso y en cola por ruta pesada.",
+                "# TYPE abet_admission_requests gauge",
+            ]
+            for stats in admission_stats:
+                lines.append(f'abet_admission_requests{{route="{stats["route"]}",state="active"}} {stats["active"]}')
+                lines.append(f'abet_admission_requests{{route="{stats["route"]}",state="waiting"}} {stats["waiting"]}')
+            lines += [
+                "# HELP abet_admission_rejected_total Peticiones rechazadas con 503 por cola llena o espera agotada.",
+                "# TYPE abet_admission_rejected_total counter",
+            ]
+            for stats in admission_stats:
+                lines.append(f'abet_admission_rejected_total{{route="{stats["route"]}",reason="queue_full"}} {stats["rejected"]}')
+                lines.append(f'abet_admission_rejected_total{{route="{stats["route"]}",reason="timeout"}} {stats["timed_out"]}')
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry(METRICS_BUCKETS)
+
+def log_slow_request(method, route, status, duration, metrics):
+    lines = [
+        f"Petición lenta: {method} {route} {status} {duration * 1000:.1f} ms "
+        f"({metrics.queries} consultas, {metrics.db_time * 1000:.1f} ms en BD, "
+        f"{metrics.connect_time * 1000:.1f} ms esperando conexión)"
+    ]
+    for operation, seconds in metrics.statements:
+        sql = " ".join(str(operation).split())
+        if len(sql) > SLOW_REQUEST_SQL_CHARS:
+            sql = sql[:SLOW_REQUEST_SQL_CHARS] + "..."
+        lines.append(f"  {seconds * 1000:8.1f} ms  {sql}")
+    logger.warning("\n".join(lines))
+
+class MetricsMiddleware:
+    """Registra latencia, consultas y tiempo de BD de cada petición HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metrics = RequestMetrics(keep_statements=SLOW_REQUEST_MS > 0)
+        token = current_request_metrics.set(metrics)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request_metrics.reset(token)
+            duration = time.perf_counter() - start
+            route = scope.get("route")
+            # Las URLs sin ruta se agrupan para no crear una serie por cada path desconocido
+            route_path = getattr(route, "path", "unmatched")
+            metrics_registry.observe(scope["method"], route_path, status, duration, metrics)
+            if SLOW_REQUEST_MS > 0 and duration * 1000 >= SLOW_REQUEST_MS:
+                with metrics_registry._lock:
+                    metrics_registry.slow_requests += 1
+                log_slow_request(scope["method"], route_path, status, duration, metrics)
+
+app.add_middleware(MetricsMiddleware)
+
+# Pool de conexiones
+# Tamaño base del pool, conexiones extra permitidas en picos (overflow), espera máxima
+# al pedir una conexión y tiempo de vida máximo antes de reciclarla.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+class PooledConnection:
+    """Envoltura de una conexión del pool: `close()` la devuelve al pool en lugar de cerrarla."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.returned = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def replica(self):
+        return self._pool.replica
+
+    def is_connected(self):
+        return not self.returned
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs), self.replica)
+
+    def close(self):
+        if not self.returned:
+            self.returned = True
+            self._pool.release(self)
+
+class ConnectionPool:
+    """Pool de conexiones MySQL con overflow, verificación al reutilizar y reciclaje por antigüedad."""
+
+    def __init__(self, config, size, max_overflow, timeout, recycle):
+        self.config = dict(config, autocommit=True)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.replica = None  # Nombre de la réplica; None en el primario
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._opened = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._discarded = 0
+
+    def _open(self):
+        return PooledConnection(self, mysql.connector.connect(**self.config))
+
+    def _is_usable(self, conn):
+        if self.recycle and time.monotonic() - conn.created_at > self.recycle:
+            self._recycled += 1
+            return False
+        try:
+            conn._raw.ping(reconnect=False)
+            return True
+        except Error:
+            self._discarded += 1
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn._raw.close()
+        except Error:
+            pass
+
+    def _forget(self):
+        with self._cond:
+            self._opened -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def acquire(self):
+        start = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._idle and self._opened >= self.size + self.max_overflow:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise Error(msg=f"Pool de conexiones agotado ({self._opened} en uso)")
+                    self._cond.wait(remaining)
+                conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    self._opened += 1
+                self._in_use += 1
+
+            # El ping y el handshake se hacen fuera del lock para no bloquear a otros hilos
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    self._forget()
+                    raise
+            elif not self._is_usable(conn):
+                # Conexión caída o demasiado antigua: descartarla y volver a intentar
+                self._discard(conn)
+                self._forget()
+                continue
+
+            conn.returned = False
+            with self._cond:
+                self._record_wait(start)
+            return conn
+
+    def _record_wait(self, start):
+        waited = time.monotonic() - start
+        self._waits += 1
+        self._wait_time += waited
+        self._max_wait_time = max(self._max_wait_time, waited)
+
+    def release(self, conn):
+        # Sin ping al devolver: `acquire` ya verifica la conexión antes de reutilizarla
+        with self._cond:
+            self._in_use -= 1
+            # Las conexiones de overflow se cierran al devolverse; el pool base se conserva
+            keep = len(self._idle) < self.size
+            if keep:
+                self._idle.append(conn)
+            else:
+                self._opened -= 1
+            self._cond.notify()
+        if not keep:
+            # El cierre del socket se hace fuera del lock
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._opened,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._waits,
+                "avg_wait_ms": round(self._wait_time / self._waits * 1000, 2) if self._waits else 0,
+                "max_wait_ms": round(self._max_wait_time * 1000, 2),
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+            }
+
+db_pool = ConnectionPool(DB_CONFIG, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE)
+app.state.db_pool = db_pool
+
+# Réplicas de lectura
+# Las agregaciones de las rutas pesadas (assessment, chart, reporte, batch, exportación) pueden
+# leerse de réplicas (DB_REPLICA_HOSTS="host:puerto,host:puerto") para no competir con las
+# escrituras de Moodle en el primario; el catálogo y las búsquedas ligeras siguen en el primario.
+# Cada réplica tiene su propio pool y se elige por turno (round_robin) o por menos conexiones
+# en uso (least_connections). El retraso se mide con SHOW REPLICA STATUS cada
+# DB_REPLICA_CHECK_INTERVAL segundos; una réplica con más de DB_REPLICA_MAX_LAG segundos de
+# retraso, con la replicación detenida o que no responde se omite hasta la siguiente medición,
+# y si no queda ninguna se usa el primario.
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 30))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 5))
+
+def parse_replica_hosts(raw, default_port):
+    """"db2:3306,db3" -> [("db2", 3306), ("db3", default_port)]"""
+    replicas = []
+    for item in raw.split(","):
+        item = item.strip()
+        if item:
+            host, _, port = item.partition(":")
+            replicas.append((host, int(port) if port else default_port))
+    return replicas
+
+def fetch_replica_lag(cursor):
+    """Segundos de retraso de la réplica; None si la replicación está detenida.
+
+    Un servidor sin estado de réplica (una copia independiente, p.ej. en pruebas locales) cuenta como al día.
+    """
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+    except Error:
+        # MySQL anterior a 8.0.22 y MariaDB
+        cursor.execute("SHOW SLAVE STATUS")
+    rows = cursor.fetchall()
+    if not rows:
+        return 0.0
+    lags = []
+    for row in rows:
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        if lag is None:
+            return None
+        lags.append(float(lag))
+    return max(lags)
+
+class ReplicaPool:
+    """Pool de una réplica con el último retraso medido."""
+
+    def __init__(self, host, port, max_lag, check_interval):
+        self.name = f"{host}:{port}"
+        config = dict(DB_CONFIG, host=host, port=port)
+        config["user"] = os.getenv("DB_REPLICA_USER") or config["user"]
+        config["password"] = os.getenv("DB_REPLICA_PASSWORD") or config["password"]
+        self.pool = ConnectionPool(config, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE)
+        self.pool.replica = self.name
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+        self.routed = 0
+
+    def usable(self):
+        return self.lag is not None and self.lag <= self.max_lag
+
+    def needs_check(self):
+        return self.checked_at is None or time.monotonic() - self.checked_at > self.check_interval
+
+    def mark_failed(self, error):
+        self.lag = None
+        self.error = str(error)
+        self.checked_at = time.monotonic()
+
+    def check(self, conn):
+        """Medir el retraso con la conexión recién obtenida; retorna si la réplica es utilizable"""
+        cursor = conn.cursor(dictionary=True)
+        try:
+            self.lag = fetch_replica_lag(cursor)
+            self.error = None if self.lag is not None else "Replicación detenida"
+        except Error as e:
+            self.lag = None
+            self.error = str(e)
+        finally:
+            cursor.close()
+        self.checked_at = time.monotonic()
+        return self.usable()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "lag_seconds": self.lag,
+            "usable": self.usable(),
+            "last_check_age_seconds": round(time.monotonic() - self.checked_at, 3) if self.checked_at is not None else None,
+            "error": self.error,
+            "routed": self.routed,
+            "pool": self.pool.stats(),
+        }
+
+class ReplicaRouter:
+    """Reparte las lecturas pesadas entre las réplicas al día y vuelve al primario si no hay ninguna."""
+
+    def __init__(self, primary, replicas, strategy):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"DB_REPLICA_STRATEGY desconocida: {strategy}")
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self._turn = itertools.count()
+        self.fallbacks = 0
+        self.behind_version = 0
+
+    def _candidates(self):
+        # Las réplicas descartadas en la última medición se vuelven a probar cuando ésta caduca
+        candidates = [replica for replica in self.replicas if replica.usable() or replica.needs_check()]
+        if self.strategy == "least_connections":
+            return sorted(candidates, key=lambda replica: replica.pool._in_use)
+        if not candidates:
+            return candidates
+        start = next(self._turn) % len(candidates)
+        return candidates[start:] + candidates[:start]
+
+    def acquire(self):
+        for replica in self._candidates():
+            try:
+                conn = replica.pool.acquire()
+            except Error as e:
+                replica.mark_failed(e)
+                logger.warning("Réplica %s no disponible: %s", replica.name, e)
+                continue
+            if replica.needs_check() and not replica.check(conn):
+                conn.close()
+                continue
+            replica.routed += 1
+            return conn
+        if self.replicas:
+            self.fallbacks += 1
+        return self.primary.acquire()
+
+    def stats(self):
+        return {
+            "strategy": self.strategy,
+            "max_lag_seconds": DB_REPLICA_MAX_LAG,
+            "fallbacks_to_primary": self.fallbacks,
+            "reads_behind_version": self.behind_version,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+replica_router = ReplicaRouter(
+    db_pool,
+    [ReplicaPool(host, port, DB_REPLICA_MAX_LAG, DB_REPLICA_CHECK_INTERVAL)
+     for host, port in parse_replica_hosts(DB_REPLICA_HOSTS, DB_CONFIG["port"])],
+    DB_REPLICA_STRATEGY,
+)
+
+# El retraso en segundos no basta para las ETag y la caché de payloads, que usan la versión de
+# datos leída en el primario: una réplica unos instantes por detrás serviría datos anteriores con
+# la ETag de la versión nueva. Quien cachea o etiqueta una lectura deja en `replica_read` la
+# versión esperada; cada conexión a una réplica lee su propia versión y, si no coincide, marca la
+# lectura como desfasada para que se sirva sin ETag y sin guardarse en la caché.
+replica_read = contextvars.ContextVar("replica_read", default=None)
+
+class ReplicaRead:
+    """Versión `(evaluaciones, catálogo)` que deben tener las lecturas en réplicas de una petición."""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.behind = False
+
+def check_replica_version(conn):
+    read = replica_read.get()
+    if read is None or conn.replica is None:
+        return
+    cursor = conn.cursor()
+    try:
+        version = fetch_data_version(cursor)
+    finally:
+        cursor.close()
+    if version != read.expected:
+        read.behind = True
+        replica_router.behind_version += 1
+
+def get_db_connection(replica=False):
+    """Conexión del pool primario; con `replica=True`, de una réplica de lectura si hay alguna al día"""
+    start = time.perf_counter()
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        if not replica:
+            return db_pool.acquire()
+        conn = replica_router.acquire()
+        try:
+            check_replica_version(conn)
+        except Error:
+            conn.close()
+            raise
+        return conn
     except Error as e:
         raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
+    finally:
+        metrics = current_request_metrics.get()
+        if metrics is not None:
+            metrics.record_connect(time.perf_counter() - start)
 
 def close_db_connection(conn, cursor):
     if cursor: cursor.close()
     if conn and conn.is_connected(): conn.close()
 
+# Ejecutor de consultas
+# mysql.connector es bloqueante: todo el trabajo con la BD se ejecuta en un pool de hilos
+# acotado para no detener el event loop. Por defecto tantos hilos como conexiones del pool.
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW))
+db_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="db")
+
+async def run_db(func, *args):
+    """Ejecutar `func(*args)` en el ejecutor de BD y esperar su resultado sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, functools.partial(ctx.run, func, *args))
+
+@app.on_event("shutdown")
+def shutdown_db_executor():
+    db_executor.shutdown(wait=False, cancel_futures=True)
+
+# Tiempo máximo de las agregaciones
+# Las consultas que recorren mdl_gradingform_utb_evaluations en las rutas pesadas llevan el hint
+# MAX_EXECUTION_TIME (MySQL 5.7.8+): el servidor las cancela pasados DB_STATEMENT_TIMEOUT_MS y
+# la petición responde 503 con Retry-After en lugar de retener una conexión y un hilo. 0 lo desactiva.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 10000))
+STATEMENT_TIMEOUT_HINT = f"/*+ MAX_EXECUTION_TIME({DB_STATEMENT_TIMEOUT_MS}) */ " if DB_STATEMENT_TIMEOUT_MS > 0 else ""
+# ER_QUERY_TIMEOUT de MySQL y ER_STATEMENT_TIMEOUT de MariaDB
+STATEMENT_TIMEOUT_ERRNOS = {3024, 1969}
+
+def query_error(e, detail):
+    """HTTPException para un error de BD; 503 si la consulta superó el tiempo máximo"""
+    if getattr(e, "errno", None) in STATEMENT_TIMEOUT_ERRNOS:
+        return HTTPException(
+            status_code=503,
+            detail="Consulta cancelada por superar el tiempo máximo de ejecución",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+        )
+    return HTTPException(status_code=500, detail=f"{detail}: {str(e)}")
+
+# Caché del catálogo de rúbricas
+# Outcomes, indicadores y niveles casi nunca cambian: se sirven desde memoria con TTL y
+# expulsión LRU para las entradas por id. Se invalida desde /api/admin/cache/invalidate.
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 300))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 1024))
+
+class TTLCache:
+    """Caché LRU acotada con expiración por entrada y contadores de aciertos/fallos."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Retorna `(encontrado, valor)`"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Eliminar una entrada, o todas si no se indica `key`. Retorna cuántas se eliminaron"""
+        with self._lock:
+            if key is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            return 1 if self._entries.pop(key, None) is not None else 0
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "keys": [
+                    {"key": key, "expires_in": round(expires_at - now, 1)}
+                    for key, (expires_at, _) in self._entries.items()
+                ],
+            }
+
+catalog_caches = {
+    "outcomes": TTLCache(CATALOG_CACHE_TTL, 1),
+    "indicators": TTLCache(CATALOG_CACHE_TTL, CATALOG_CACHE_MAX_ENTRIES),
+    "levels": TTLCache(CATALOG_CACHE_TTL, CATALOG_CACHE_MAX_ENTRIES),
+    "outcome_summary": TTLCache(CATALOG_CACHE_TTL, CATALOG_CACHE_MAX_ENTRIES),
+}
+
+async def cached_catalog(cache, key, loader, *args):
+    """Servir `loader(*args)` desde la caché; sólo se consulta la BD en un fallo"""
+    found, value = cache.get(key)
+    if found:
+        return value
+    value = await run_db(loader, *args)
+    cache.set(key, value)
+    return value
+
+def parse_path_id(raw_id):
+    """Limpiar (quitar llaves) y validar un id recibido en la ruta"""
+    clean_id = raw_id.strip('{}').strip()
+    try:
+        return int(clean_id)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"ID inválido: '{raw_id}'. Debe ser un número entero.")
+
 # Modelos
 class StudentOutcome(BaseModel):
     id: int
@@ -96,332 +860,2146 @@ class EvaluationResult(BaseModel):
     timecreated: int
     timemodified: int
 
-# Endpoints
-@app.get("/health")
-def health_check():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchone()
-        close_db_connection(conn, cursor)
-        return {"status": "healthy"}
-    except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
+# Índice de niveles de desempeño
+# Mapeo precalculado `performance_level_id -> letra (E, G, F, I)` construido una vez desde
+# mdl_gradingform_utb_lvl. Se reconstruye sólo cuando cambia la huella de la tabla, que se
+# revisa como máximo cada LEVEL_INDEX_CHECK_INTERVAL segundos.
+# LEVEL_LETTER_RULES: reglas "LETRA=SINÓNIMO,SINÓNIMO;..." evaluadas en orden sobre el título.
+LEVEL_LETTER_RULES = os.getenv(
+    "LEVEL_LETTER_RULES",
+    "E=EXCELLENT,EXCELENTE;G=GOOD,BUENO;F=FAIR,REGULAR;I=INADEQUATE,INADECUADO",
+)
+LEVEL_INDEX_CHECK_INTERVAL = int(os.getenv("LEVEL_INDEX_CHECK_INTERVAL", 60))
 
-@app.get("/api/outcomes", response_model=List[StudentOutcome], dependencies=[Depends(verify_api_key)])
-def get_outcomes(teacher_id: Optional[int] = Query(None), teacher_name: Optional[str] = Query(None)):
-    """Listar outcomes. Opcionalmente filtrar por profesor (`teacher_id` o `teacher_name`).
-    El filtrado busca outcomes que tengan evaluaciones en cursos donde el usuario
-    está asignado con un rol cuyo `shortname` contiene 'teacher'.
-    """
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+def parse_level_rules(spec):
+    rules = []
+    for rule in spec.split(";"):
+        if "=" not in rule:
+            continue
+        letter, synonyms = rule.split("=", 1)
+        words = tuple(w.strip().upper() for w in synonyms.split(",") if w.strip())
+        if letter.strip() and words:
+            rules.append((letter.strip().upper(), words))
+    return rules
 
-    # Sin filtro, devolver todos los outcomes
-    if not teacher_id and not teacher_name:
-        cursor.execute("SELECT id, so_number, description_es AS description FROM mdl_gradingform_utb_outcomes")
-        results = cursor.fetchall()
-        close_db_connection(conn, cursor)
-        return results
+def classify_level_title(title, rules):
+    """Letra del nivel según el primer grupo de sinónimos contenido en el título, o None"""
+    title = (title or "").upper()
+    for letter, words in rules:
+        if any(word in title for word in words):
+            return letter
+    return None
 
-    # Con filtro por profesor: buscar outcomes que tengan evaluaciones en cursos
-    # donde ese usuario está asignado como profesor.
-    try:
-        if teacher_id:
-            sql = """
-                SELECT DISTINCT o.id, o.so_number, o.description_es AS description
-                FROM mdl_gradingform_utb_outcomes o
-                JOIN mdl_gradingform_utb_indicators i ON i.student_outcome_id = o.id
-                JOIN mdl_gradingform_utb_evaluations e ON e.indicator_id = i.id
-                JOIN mdl_context c ON c.instanceid = e.courseid AND c.contextlevel = 50
-                JOIN mdl_role_assignments ra ON ra.contextid = c.id
-                JOIN mdl_role r ON r.id = ra.roleid
-                JOIN mdl_user u ON u.id = ra.userid
-                WHERE r.shortname LIKE %s AND u.id = %s
-            """
-            params = ("%teacher%", teacher_id)
-            cursor.execute(sql, params)
-        else:
-            # Filtrado por nombre (buscar coincidencias parciales en nombre y apellido)
-            name_like = f"%{teacher_name}%"
-            sql = """
-                SELECT DISTINCT o.id, o.so_number, o.description_es AS description
-                FROM mdl_gradingform_utb_outcomes o
-                JOIN mdl_gradingform_utb_indicators i ON i.student_outcome_id = o.id
-                JOIN mdl_gradingform_utb_evaluations e ON e.indicator_id = i.id
-                JOIN mdl_context c ON c.instanceid = e.courseid AND c.contextlevel = 50
-                JOIN mdl_role_assignments ra ON ra.contextid = c.id
-                JOIN mdl_role r ON r.id = ra.roleid
-                JOIN mdl_user u ON u.id = ra.userid
-                WHERE r.shortname LIKE %s AND CONCAT(u.firstname, ' ', u.lastname) LIKE %s
-            """
-            params = ("%teacher%", name_like)
-            cursor.execute(sql, params)
+class LevelIndex:
+    """Índice en memoria de la letra de cada nivel de desempeño, agrupado por indicador."""
 
-        results = cursor.fetchall()
-        return results
-    finally:
-        close_db_connection(conn, cursor)
+    def __init__(self, rules, check_interval):
+        self.rules = rules
+        self.check_interval = check_interval
+        self._by_indicator = {}
+        self._fingerprint = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.built_at = None
 
-@app.get("/api/indicators/{outcome_id:path}", response_model=List[PerformanceIndicator], dependencies=[Depends(verify_api_key)])
-def get_indicators(outcome_id: str):
-    """Obtener todos los indicadores de un outcome específico"""
-    conn = None
-    cursor = None
-    try:
-        # Limpiar y validar outcome_id
-        clean_id = outcome_id.strip('{}').strip()
-        try:
-            outcome_id_int = int(clean_id)
-        except ValueError:
-            raise HTTPException(status_code=422, detail=f"ID inválido: '{outcome_id}'. Debe ser un número entero.")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener indicadores (retorna lista vacía si no hay)
-        cursor.execute("SELECT id, student_outcome_id, indicator_letter, description_es AS description FROM mdl_gradingform_utb_indicators WHERE student_outcome_id = %s", (outcome_id_int,))
-        results = cursor.fetchall()
-        return results
-    except HTTPException:
-        raise
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"Error al consultar indicadores: {str(e)}")
-    finally:
-        close_db_connection(conn, cursor)
+    def _classify(self, level):
+        letter = classify_level_title(level["title_en"], self.rules)
+        if letter is None:
+            letter = classify_level_title(level["title_es"], self.rules)
+        if letter is None:
+            # Si no coincide, usar primera letra del título
+            title = (level["title_en"] or "").upper()
+            letter = title[0] if title else "U"
+        return letter
 
-@app.get("/api/levels/{indicator_id:path}", response_model=List[PerformanceLevel], dependencies=[Depends(verify_api_key)])
-def get_levels(indicator_id: str):
-    """Obtener todos los niveles de desempeño de un indicador específico"""
-    conn = None
-    cursor = None
-    try:
-        # Limpiar y validar indicator_id
-        clean_id = indicator_id.strip('{}').strip()
-        try:
-            indicator_id_int = int(clean_id)
-        except ValueError:
-            raise HTTPException(status_code=422, detail=f"ID inválido: '{indicator_id}'. Debe ser un número entero.")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Obtener niveles y mapear los campos correctamente
+    def _ensure_fresh(self, cursor):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
         cursor.execute("""
-            SELECT id, indicator_id, 
-                   title_es AS title, 
-                   description_es AS description, 
-                   minscore, maxscore
-            FROM mdl_gradingform_utb_lvl 
-            WHERE indicator_id = %s 
-            ORDER BY sortorder DESC
-        """, (indicator_id_int,))
-        results = cursor.fetchall()
-        return results
-    except HTTPException:
-        raise
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"Error al consultar niveles: {str(e)}")
-    finally:
-        close_db_connection(conn, cursor)
+            SELECT COUNT(*) AS n, MAX(id) AS max_id, SUM(CRC32(CONCAT_WS('|', indicator_id, title_en, title_es))) AS crc
+            FROM mdl_gradingform_utb_lvl
+        """)
+        row = cursor.fetchone()
+        fingerprint = (row["n"], row["max_id"], row["crc"])
+        if fingerprint != self._fingerprint:
+            cursor.execute("SELECT id, indicator_id, title_en, title_es FROM mdl_gradingform_utb_lvl")
+            by_indicator = {}
+            for level in cursor.fetchall():
+                by_indicator.setdefault(level["indicator_id"], {})[level["id"]] = self._classify(level)
+            self._by_indicator = by_indicator
+            self._fingerprint = fingerprint
+            self.builds += 1
+            self.built_at = time.time()
+        self._checked_at = now
 
-@app.get("/api/evaluations/{student_id:path}", response_model=List[EvaluationResult], dependencies=[Depends(verify_api_key)])
-def get_evaluations(student_id: str):
-    """Obtener todas las evaluaciones de un estudiante específico por su ID"""
-    conn = None
-    cursor = None
-    try:
-        # Limpiar y validar student_id
-        clean_id = student_id.strip('{}').strip()
-        try:
-            student_id_int = int(clean_id)
-        except ValueError:
-            raise HTTPException(status_code=422, detail=f"ID inválido: '{student_id}'. Debe ser un número entero.")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT id, instanceid, studentid, courseid, activityid, activityname,
-                   student_outcome_id, indicator_id, performance_level_id, 
-                   score, feedback, timecreated, timemodified
-            FROM mdl_gradingform_utb_evaluations
-            WHERE studentid = %s
-            ORDER BY timecreated DESC
-        """, (student_id_int,))
-        results = cursor.fetchall()
-        
-        # Retorna lista vacía si no hay evaluaciones (no es error)
-        return results
-    except HTTPException:
-        raise
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"Error al consultar evaluaciones: {str(e)}")
-    finally:
-        close_db_connection(conn, cursor)
+    def maps_for(self, cursor, indicator_ids):
+        """Mapeo `performance_level_id -> letra` de cada indicador (sin consultar la BD si el índice está vigente)"""
+        with self._lock:
+            self._ensure_fresh(cursor)
+            by_indicator = self._by_indicator
+        return {indicator_id: by_indicator.get(indicator_id, {}) for indicator_id in indicator_ids}
 
-@app.get("/api/outcome-summary/{outcome_id}", dependencies=[Depends(verify_api_key)])
-def get_outcome_summary(outcome_id: int):
-    conn = None
-    cursor = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM mdl_gradingform_utb_outcomes WHERE id = %s", (outcome_id,))
-        outcome = cursor.fetchone()
-        if not outcome:
-            raise HTTPException(status_code=404, detail="Outcome no encontrado")
-        cursor.execute("SELECT * FROM mdl_gradingform_utb_indicators WHERE student_outcome_id = %s", (outcome_id,))
-        indicators = cursor.fetchall()
-        for indicator in indicators:
-            cursor.execute("SELECT * FROM mdl_gradingform_utb_lvl WHERE indicator_id = %s", (indicator["id"],))
-            indicator["levels"] = cursor.fetchall()
-        outcome["indicators"] = indicators
-        return outcome
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"Error al consultar resumen: {str(e)}")
-    finally:
-        close_db_connection(conn, cursor)
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = None
+            self._fingerprint = None
 
-@app.get("/api/outcome-assessment/{outcome_id}", dependencies=[Depends(verify_api_key)])
-def get_outcome_assessment(outcome_id: int):
-    """
-    Obtener estadísticas de evaluación directa por nivel de desempeño (E, G, F, I)
-    para cada indicador de performance de un outcome específico.
-    """
-    conn = None
-    cursor = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Verificar que el outcome existe
-        cursor.execute("SELECT id, so_number FROM mdl_gradingform_utb_outcomes WHERE id = %s", (outcome_id,))
-        outcome = cursor.fetchone()
+    def stats(self):
+        return {
+            "indicators": len(self._by_indicator),
+            "levels": sum(len(levels) for levels in self._by_indicator.values()),
+            "builds": self.builds,
+            "built_at": self.built_at,
+            "check_interval_seconds": self.check_interval,
+            "rules": {letter: list(words) for letter, words in self.rules},
+        }
+
+level_index = LevelIndex(parse_level_rules(LEVEL_LETTER_RULES), LEVEL_INDEX_CHECK_INTERVAL)
+
+# Acceso a datos de estadísticas
+# Consultas por conjunto (un número fijo de consultas por outcome, sin importar
+# cuántos indicadores tenga) compartidas por los endpoints de estadísticas.
+def _in_placeholders(values):
+    return ",".join(["%s"] * len(values))
+
+def fetch_outcome_indicators(cursor, outcome_id):
+    cursor.execute("""
+        SELECT id, indicator_letter, description_en AS description
+        FROM mdl_gradingform_utb_indicators 
+        WHERE student_outcome_id = %s 
+        ORDER BY indicator_letter
+    """, (outcome_id,))
+    return cursor.fetchall()
+
+# Filtros de cohorte y periodo
+# `courseid`, `from`/`to` (sobre `timecreated`, inclusivos) y `program` acotan las evaluaciones
+# que se agregan. Se traducen a condiciones de la misma consulta agrupada; el programa se
+# resuelve con una subconsulta sobre los campos de perfil, sin traer estudiantes a memoria.
+def evaluation_scope(
+    courseid: Optional[int] = Query(None, description="Sólo evaluaciones de este curso"),
+    time_from: Optional[int] = Query(None, alias="from", ge=0, description="timecreated mínimo (Unix)"),
+    time_to: Optional[int] = Query(None, alias="to", ge=0, description="timecreated máximo (Unix)"),
+    program: Optional[str] = Query(None, description="Programa del estudiante (campo de perfil)"),
+):
+    """Dependencia con los filtros de la petición; None si no hay ninguno"""
+    if time_from is not None and time_to is not None and time_from > time_to:
+        raise HTTPException(status_code=422, detail="'from' no puede ser posterior a 'to'")
+    scope = {"courseid": courseid, "from": time_from, "to": time_to, "program": program}
+    if all(value is None for value in scope.values()):
+        return None
+    return scope
+
+def scope_conditions(cursor, scope, alias="e"):
+    """Condiciones SQL (`AND ...`) y parámetros que acotan las evaluaciones al filtro"""
+    if not scope:
+        return "", ()
+    conditions, params = [], []
+    if scope["courseid"] is not None:
+        conditions.append(f"{alias}.courseid = %s")
+        params.append(scope["courseid"])
+    if scope["from"] is not None:
+        conditions.append(f"{alias}.timecreated >= %s")
+        params.append(scope["from"])
+    if scope["to"] is not None:
+        conditions.append(f"{alias}.timecreated <= %s")
+        params.append(scope["to"])
+    if scope["program"] is not None:
+        field_ids = profile_resolver.field_ids(cursor)
+        if field_ids:
+            conditions.append(f"""{alias}.studentid IN (
+                SELECT userid FROM mdl_user_info_data
+                WHERE fieldid IN ({_in_placeholders(field_ids)}) AND data = %s
+            )""")
+            params.extend(field_ids)
+            params.append(scope["program"])
+        else:
+            # Sin campo de programa en el perfil ningún estudiante puede coincidir
+            conditions.append("1 = 0")
+    return "".join(f" AND {condition}" for condition in conditions), tuple(params)
+
+def fetch_level_counts(cursor, indicator_ids, scope=None):
+    """Conteo de evaluaciones por nivel de cada indicador, agrupado en una sola consulta"""
+    level_counts = {indicator_id: [] for indicator_id in indicator_ids}
+    if not indicator_ids:
+        return level_counts
+    scope_sql, scope_params = scope_conditions(cursor, scope)
+    cursor.execute(f"""
+        SELECT {STATEMENT_TIMEOUT_HINT}e.indicator_id, e.performance_level_id, COUNT(*) as count
+        FROM mdl_gradingform_utb_evaluations e
+        WHERE e.indicator_id IN ({_in_placeholders(indicator_ids)}){scope_sql}
+        GROUP BY e.indicator_id, e.performance_level_id
+    """, tuple(indicator_ids) + scope_params)
+    for row in cursor.fetchall():
+        level_counts[row["indicator_id"]].append(row)
+    return level_counts
+
+# Estadísticas materializadas
+# Conteos de evaluaciones por indicador y nivel mantenidos en memoria. Una tarea de fondo los
+# construye con una agregación completa y luego las lecturas los refrescan de forma incremental:
+# sólo se leen las evaluaciones con `timemodified` o `id` posteriores a la marca de agua y se
+# recalculan los indicadores afectados, de modo que un cambio de `performance_level_id` mueve su
+# conteo. Las filas borradas no dejan rastro; la reconstrucción periódica (cada
+# STATS_FULL_REBUILD_INTERVAL segundos, fuera de las peticiones) las corrige.
+STATS_STORE_ENABLED = os.getenv("STATS_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", 15))
+STATS_FULL_REBUILD_INTERVAL = int(os.getenv("STATS_FULL_REBUILD_INTERVAL", 3600))
+
+def fetch_evaluations_watermark(cursor):
+    """`(MAX(timemodified), MAX(id))` de las evaluaciones: cambia con cada alta o modificación"""
+    cursor.execute("SELECT MAX(timemodified) AS timemodified, MAX(id) AS max_id FROM mdl_gradingform_utb_evaluations")
+    row = cursor.fetchone()
+    return row["timemodified"] or 0, row["max_id"] or 0
+
+def fetch_touched_indicators(cursor, watermark):
+    """Indicadores con evaluaciones modificadas (`timemodified`) o nuevas (`id`) desde `watermark`.
+
+    Una fila nueva puede llegar con un `timemodified` antiguo (importaciones, copias de cursos):
+    sólo el id la delata.
+    """
+    timemodified, max_id = watermark
+    cursor.execute("""
+        SELECT indicator_id FROM mdl_gradingform_utb_evaluations WHERE timemodified >= %s
+        UNION
+        SELECT indicator_id FROM mdl_gradingform_utb_evaluations WHERE id > %s
+    """, (timemodified, max_id))
+    return [row["indicator_id"] for row in cursor.fetchall()]
+
+class OutcomeStatsStore:
+    """Conteos materializados `indicator_id -> {performance_level_id: count}` con refresco incremental.
+
+    La agregación completa la hace una tarea de fondo que publica una instantánea nueva; las
+    peticiones sólo aplican refrescos incrementales. Hasta la primera instantánea se consulta la BD.
+    """
+
+    def __init__(self, refresh_interval, full_rebuild_interval):
+        self.refresh_interval = refresh_interval
+        self.full_rebuild_interval = full_rebuild_interval
+        self._counts = None
+        self._watermark = None
+        self._refreshed_at = None
+        self._rebuilt_at = None
+        self._lock = threading.Lock()
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+        self.full_rebuilds = 0
+        self.rebuild_errors = 0
+        self.last_rebuild_seconds = None
+        self.incremental_refreshes = 0
+        self.indicators_refreshed = 0
+        self.direct_reads = 0
+
+    def _aggregate(self):
+        """Agregación completa con una conexión propia; retorna `(conteos, marca de agua)`"""
+        conn, cursor = None, None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            # La marca de agua se toma antes de agregar: lo escrito durante la agregación se
+            # vuelve a leer en el siguiente refresco incremental
+            watermark = fetch_evaluations_watermark(cursor)
+            cursor.execute(f"""
+                SELECT {STATEMENT_TIMEOUT_HINT}indicator_id, performance_level_id, COUNT(*) as count
+                FROM mdl_gradingform_utb_evaluations
+                GROUP BY indicator_id, performance_level_id
+            """)
+            counts = {}
+            for row in cursor.fetchall():
+                counts.setdefault(row["indicator_id"], {})[row["performance_level_id"]] = row["count"]
+            return counts, watermark
+        finally:
+            close_db_connection(conn, cursor)
+
+    def rebuild(self):
+        """Reconstruir fuera del lock y publicar la instantánea nueva al terminar"""
+        start = time.monotonic()
+        counts, watermark = self._aggregate()
+        with self._lock:
+            now = time.monotonic()
+            self._counts = counts
+            self._watermark = watermark
+            self._rebuilt_at = now
+            self._refreshed_at = now
+            self.full_rebuilds += 1
+        self.last_rebuild_seconds = now - start
+
+    def _refresh_incremental(self, cursor):
+        watermark = fetch_evaluations_watermark(cursor)
+        if watermark != self._watermark:
+            touched = fetch_touched_indicators(cursor, self._watermark)
+            if touched:
+                fresh = fetch_level_counts(cursor, touched)
+                counts = dict(self._counts)
+                for indicator_id, rows in fresh.items():
+                    counts[indicator_id] = {row["performance_level_id"]: row["count"] for row in rows}
+                self._counts = counts
+                self.indicators_refreshed += len(touched)
+            self._watermark = watermark
+        self.incremental_refreshes += 1
+
+    def refresh(self, cursor, force=False):
+        """Refresco incremental si el último es más antiguo que `refresh_interval`"""
+        with self._lock:
+            if self._counts is None:
+                return
+            now = time.monotonic()
+            if force or now - self._refreshed_at >= self.refresh_interval:
+                self._refresh_incremental(cursor)
+                self._refreshed_at = now
+
+    def level_counts(self, cursor, indicator_ids):
+        """Conteos por nivel de cada indicador, con el mismo formato que `fetch_level_counts`"""
+        self.refresh(cursor)
+        counts = self._counts
+        if counts is None:
+            # Sin instantánea todavía (arranque o invalidación): agregación acotada en la BD
+            self.direct_reads += 1
+            return fetch_level_counts(cursor, indicator_ids)
+        return {
+            indicator_id: [
+                {"performance_level_id": level_id, "count": count}
+                for level_id, count in counts.get(indicator_id, {}).items()
+            ]
+            for indicator_id in indicator_ids
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await run_db(self.rebuild)
+            except Exception as e:
+                self.rebuild_errors += 1
+                logger.warning("No se pudieron reconstruir las estadísticas materializadas: %s", getattr(e, "detail", e))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.full_rebuild_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def invalidate(self):
+        """Descartar la instantánea y pedir una reconstrucción a la tarea de fondo"""
+        with self._lock:
+            self._counts = None
+            self._rebuilt_at = None
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def mark_stale(self):
+        """Forzar un refresco incremental en la siguiente lectura"""
+        with self._lock:
+            if self._refreshed_at is not None:
+                self._refreshed_at = float("-inf")
+
+    def stats(self):
+        counts = self._counts or {}
+        return {
+            "enabled": STATS_STORE_ENABLED,
+            "ready": self._counts is not None,
+            "indicators": len(counts),
+            "evaluations": sum(sum(levels.values()) for levels in counts.values()),
+            "watermark": list(self._watermark) if self._watermark is not None else None,
+            "full_rebuilds": self.full_rebuilds,
+            "rebuild_errors": self.rebuild_errors,
+            "last_rebuild_seconds": round(self.last_rebuild_seconds, 3) if self.last_rebuild_seconds is not None else None,
+            "incremental_refreshes": self.incremental_refreshes,
+            "indicators_refreshed": self.indicators_refreshed,
+            "direct_reads": self.direct_reads,
+            "refresh_interval_seconds": self.refresh_interval,
+            "full_rebuild_interval_seconds": self.full_rebuild_interval,
+        }
+
+stats_store = OutcomeStatsStore(STATS_REFRESH_INTERVAL, STATS_FULL_REBUILD_INTERVAL)
+
+@app.on_event("startup")
+async def start_stats_store():
+    if STATS_STORE_ENABLED:
+        stats_store.start()
+
+@app.on_event("shutdown")
+async def stop_stats_store():
+    await stats_store.stop()
+
+def outcome_level_counts(cursor, indicator_ids, scope=None):
+    """Conteos por nivel desde las estadísticas materializadas o, si están desactivadas o hay
+    filtros, con una agregación acotada en la BD"""
+    if scope:
+        return fetch_level_counts(cursor, indicator_ids, scope)
+    # Los conteos materializados siguen al primario: en una réplica se agrega en la propia réplica
+    if STATS_STORE_ENABLED and cursor.replica is None:
+        return stats_store.level_counts(cursor, indicator_ids)
+    return fetch_level_counts(cursor, indicator_ids)
+
+def build_assessment_stats(indicators, level_maps, level_counts):
+    """Estadísticas E/G/F/I y E+G / F+I por indicador a partir de los conteos agrupados"""
+    indicator_stats = []
+    for indicator in indicators:
+        indicator_id = indicator["id"]
+        level_map = level_maps[indicator_id]
+        rows = level_counts[indicator_id]
+
+        # Calcular total de evaluaciones
+        total = sum(row["count"] for row in rows)
+
+        # Organizar estadísticas por nivel (E, G, F, I)
+        stats = {
+            "E": {"count": 0, "percentage": 0},
+            "G": {"count": 0, "percentage": 0},
+            "F": {"count": 0, "percentage": 0},
+            "I": {"count": 0, "percentage": 0}
+        }
+
+        for row in rows:
+            count = row["count"]
+            level_letter = level_map.get(row["performance_level_id"], "U")
+
+            if level_letter in stats:
+                stats[level_letter]["count"] = count
+                if total > 0:
+                    stats[level_letter]["percentage"] = round((count / total) * 100)
+
+        # Calcular E+G y F+I
+        eg_count = stats["E"]["count"] + stats["G"]["count"]
+        fi_count = stats["F"]["count"] + stats["I"]["count"]
+        eg_percentage = round((eg_count / total) * 100) if total > 0 else 0
+        fi_percentage = round((fi_count / total) * 100) if total > 0 else 0
+
+        indicator_stats.append({
+            "indicator": indicator["indicator_letter"],
+            "indicator_id": indicator_id,
+            "total_evaluations": total,
+            "levels": stats,
+            "summary": {
+                "E_plus_G": {"count": eg_count, "percentage": eg_percentage},
+                "F_plus_I": {"count": fi_count, "percentage": fi_percentage}
+            }
+        })
+    return indicator_stats
+
+def build_chart_data(indicators, level_maps, level_counts):
+    """Porcentaje de evaluaciones en nivel E+G por indicador"""
+    chart_data = []
+    for indicator in indicators:
+        indicator_id = indicator["id"]
+        level_map = level_maps[indicator_id]
+        rows = level_counts[indicator_id]
+
+        total = sum(row["count"] for row in rows)
+        eg_count = sum(row["count"] for row in rows
+                       if level_map.get(row["performance_level_id"], "U") in ("E", "G"))
+        eg_percentage = round((eg_count / total) * 100) if total > 0 else 0
+
+        chart_data.append({
+            "indicator": indicator["indicator_letter"],
+            "indicator_id": indicator_id,
+            "percentage_eg": eg_percentage,
+            "count_eg": eg_count,
+            "total": total
+        })
+    return chart_data
+
+def build_assessment_payload(outcome_id, so_number, indicators, level_maps, level_counts):
+    """Respuesta de /api/outcome-assessment"""
+    if not indicators:
+        return {
+            "outcome_id": outcome_id,
+            "so_number": so_number,
+            "indicators": [],
+            "summary": {}
+        }
+    return {
+        "outcome_id": outcome_id,
+        "so_number": so_number,
+        "indicators": build_assessment_stats(indicators, level_maps, level_counts)
+    }
+
+def build_chart_payload(outcome_id, so_number, indicators, level_maps, level_counts):
+    """Respuesta de /api/outcome-chart"""
+    if not indicators:
+        return {
+            "outcome_id": outcome_id,
+            "so_number": so_number,
+            "chart_data": []
+        }
+    return {
+        "outcome_id": outcome_id,
+        "so_number": so_number,
+        "title": f"Percentage of student relates can attained E+G Level",
+        "chart_data": build_chart_data(indicators, level_maps, level_counts)
+    }
+
+def build_indicators_status(indicators, level_maps, level_counts):
+    """Estado de cada indicador para el reporte del outcome (conteos E/G/F/I y estados)"""
+    indicators_status = []
+    total_students = 0
+
+    for indicator in indicators:
+        indicator_id = indicator["id"]
+        level_map = level_maps[indicator_id]
+        rows = level_counts[indicator_id]
+
+        # Calcular total de evaluaciones
+        total_evaluations = sum(row["count"] for row in rows)
+        if total_evaluations > total_students:
+            total_students = total_evaluations
+
+        # Contar por nivel
+        counts = {"E": 0, "G": 0, "F": 0, "I": 0}
+        for row in rows:
+            level_letter = level_map.get(row["performance_level_id"], "U")
+            if level_letter in counts:
+                counts[level_letter] += row["count"]
+
+        # Determinar estado: Ok si tiene evaluaciones, Pendiente si no
+        assessment_status = "Ok" if total_evaluations > 0 else "Pendiente"
+        student_status = "Pendiente" if (counts["F"] + counts["I"]) > 0 else "Ok"
+
+        indicators_status.append({
+            "indicator": indicator["indicator_letter"],
+            "indicator_id": indicator_id,
+            "description": indicator["description"],
+            "assessment_status": assessment_status,
+            "student_status": student_status,
+            "evaluations": {
+                "E": counts["E"],
+                "G": counts["G"],
+                "F": counts["F"],
+                "I": counts["I"],
+                "total": total_evaluations
+            }
+        })
+    return indicators_status, total_students
+
+def build_compliance(indicators_status):
+    """Porcentaje de cumplimiento del outcome: Compliance = (E + G) / Total"""
+    total_eg = sum(ind["evaluations"]["E"] + ind["evaluations"]["G"] for ind in indicators_status)
+    total_all = sum(ind["evaluations"]["total"] for ind in indicators_status)
+
+    compliance_percentage = round((total_eg / total_all) * 100) if total_all > 0 else 0
+    return {
+        "percentage": compliance_percentage,
+        "missing_percentage": 100 - compliance_percentage
+    }
+
+# Máximo de ids por consulta `IN (...)` al resolver datos de muchos estudiantes
+USER_LOOKUP_CHUNK_SIZE = int(os.getenv("USER_LOOKUP_CHUNK_SIZE", 1000))
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def fetch_outcome_courses(cursor, outcome_id, scope=None):
+    """Cursos con evaluaciones del outcome y sus profesores, en dos consultas agrupadas por courseid"""
+    scope_sql, scope_params = scope_conditions(cursor, scope)
+    cursor.execute(f"""
+        SELECT {STATEMENT_TIMEOUT_HINT}DISTINCT e.courseid, co.id AS course_found, co.fullname
+        FROM mdl_gradingform_utb_evaluations e
+        JOIN mdl_gradingform_utb_indicators i ON e.indicator_id = i.id
+        LEFT JOIN mdl_course co ON co.id = e.courseid
+        WHERE i.student_outcome_id = %s{scope_sql}
+    """, (outcome_id,) + scope_params)
+    course_rows = cursor.fetchall()
+    if not course_rows:
+        return [], set()
+
+    # Profesores asignados a esos cursos (roles cuyo shortname contenga 'teacher')
+    cursor.execute(f"""
+        SELECT {STATEMENT_TIMEOUT_HINT}DISTINCT c.instanceid AS courseid, u.id, u.firstname, u.lastname
+        FROM mdl_user u
+        JOIN mdl_role_assignments ra ON ra.userid = u.id
+        JOIN mdl_context c ON c.id = ra.contextid
+        JOIN mdl_role r ON r.id = ra.roleid
+        WHERE c.contextlevel = 50 AND r.shortname LIKE %s
+          AND c.instanceid IN (
+              SELECT DISTINCT e.courseid
+              FROM mdl_gradingform_utb_evaluations e
+              JOIN mdl_gradingform_utb_indicators i ON e.indicator_id = i.id
+              WHERE i.student_outcome_id = %s{scope_sql}
+          )
+    """, ("%teacher%", outcome_id) + scope_params)
+    profs_by_course = {}
+    for p in cursor.fetchall():
+        profs_by_course.setdefault(p["courseid"], []).append(p)
+
+    courses = []
+    professors_set = set()
+    for crow in course_rows:
+        courseid = crow["courseid"]
+        course_name = crow["fullname"] if crow["course_found"] else f"course_{courseid}"
+        profs = []
+        for p in profs_by_course.get(courseid, []):
+            name = f"{p['firstname']} {p['lastname']}"
+            profs.append({"id": p["id"], "name": name})
+            professors_set.add(name)
+        courses.append({"id": courseid, "name": course_name, "professors": profs})
+    return courses, professors_set
+
+def fetch_program_field_ids(cursor):
+    """Ids de los campos personalizados de perfil que contienen el programa del estudiante"""
+    cursor.execute("SELECT id FROM mdl_user_info_field WHERE shortname LIKE %s OR name LIKE %s OR name LIKE %s", ("%program%", "%program%", "%programa%"))
+    return [r['id'] for r in cursor.fetchall()]
+
+def fetch_user_programs(cursor, user_ids, program_field_ids):
+    """Programa de cada usuario (`userid -> data`) con consultas `userid IN (...)` por bloques"""
+    programs = {}
+    if not user_ids or not program_field_ids:
+        return programs
+    field_placeholders = _in_placeholders(program_field_ids)
+    for chunk in _chunks(list(user_ids), USER_LOOKUP_CHUNK_SIZE):
+        cursor.execute(f"""
+            SELECT userid, data
+            FROM mdl_user_info_data
+            WHERE userid IN ({_in_placeholders(chunk)}) AND fieldid IN ({field_placeholders})
+        """, tuple(chunk) + tuple(program_field_ids))
+        for row in cursor.fetchall():
+            # Igual que antes: se toma el primer registro encontrado para cada usuario
+            programs.setdefault(row["userid"], row["data"])
+    return programs
+
+def fetch_graded_students(cursor, outcome_id, scope=None):
+    """Estudiantes calificados en el outcome con su programa resuelto"""
+    scope_sql, scope_params = scope_conditions(cursor, scope)
+    cursor.execute(f"""
+        SELECT {STATEMENT_TIMEOUT_HINT}DISTINCT u.id, u.firstname, u.lastname, u.idnumber, u.department
+        FROM mdl_user u
+        JOIN mdl_gradingform_utb_evaluations e ON e.studentid = u.id
+        JOIN mdl_gradingform_utb_indicators i ON e.indicator_id = i.id
+        WHERE i.student_outcome_id = %s{scope_sql}
+    """, (outcome_id,) + scope_params)
+    student_rows = cursor.fetchall()
+    if not student_rows:
+        return [], []
+
+    programs = profile_resolver.programs_for(cursor, [s['id'] for s in student_rows])
+
+    graded_students = []
+    for s in student_rows:
+        # Fallbacks si no se encontró programa en campos personalizados: department o idnumber
+        program = programs.get(s['id']) or s.get('department') or s.get('idnumber') or None
+        graded_students.append({
+            "id": s['id'],
+            "name": f"{s['firstname']} {s['lastname']}",
+            "program": program
+        })
+    # Programas reales del outcome: sólo los valores del campo de perfil, no los fallbacks
+    program_names = sorted({program for program in programs.values() if program})
+    return graded_students, program_names
+
+# Perfil de los estudiantes
+# Los ids de los campos personalizados de "programa" se resuelven al arrancar y se refrescan
+# cada PROGRAM_FIELD_TTL segundos. El programa de cada usuario se guarda en una caché LRU;
+# los usuarios que faltan se consultan en bloque con `userid IN (...)`.
+PROGRAM_FIELD_TTL = int(os.getenv("PROGRAM_FIELD_TTL", 3600))
+PROGRAM_CACHE_TTL = int(os.getenv("PROGRAM_CACHE_TTL", 3600))
+PROGRAM_CACHE_MAX_ENTRIES = int(os.getenv("PROGRAM_CACHE_MAX_ENTRIES", 50000))
+
+class ProfileResolver:
+    """Resuelve y cachea el programa de cada usuario desde los campos personalizados de perfil."""
+
+    def __init__(self, field_ttl, cache_ttl, max_entries):
+        self.field_ttl = field_ttl
+        self._field_ids = None
+        self._fields_at = None
+        self._lock = threading.Lock()
+        self.programs = TTLCache(cache_ttl, max_entries)
+
+    def field_ids(self, cursor):
+        with self._lock:
+            if self._fields_at is None or time.monotonic() - self._fields_at >= self.field_ttl:
+                self._field_ids = fetch_program_field_ids(cursor)
+                self._fields_at = time.monotonic()
+            return self._field_ids
+
+    def programs_for(self, cursor, user_ids):
+        """`userid -> programa` (None si el usuario no tiene el campo)"""
+        resolved = {}
+        misses = []
+        for user_id in user_ids:
+            found, program = self.programs.get(user_id)
+            if found:
+                resolved[user_id] = program
+            else:
+                misses.append(user_id)
+        if misses:
+            fetched = fetch_user_programs(cursor, misses, self.field_ids(cursor))
+            for user_id in misses:
+                # También se guarda la ausencia de programa para no volver a consultarla
+                resolved[user_id] = fetched.get(user_id)
+                self.programs.set(user_id, resolved[user_id])
+        return resolved
+
+    def invalidate(self):
+        with self._lock:
+            self._fields_at = None
+        self.programs.invalidate()
+
+    def stats(self):
+        status = self.programs.stats()
+        status.pop("keys")
+        status["program_field_ids"] = self._field_ids
+        status["field_ttl_seconds"] = self.field_ttl
+        return status
+
+profile_resolver = ProfileResolver(PROGRAM_FIELD_TTL, PROGRAM_CACHE_TTL, PROGRAM_CACHE_MAX_ENTRIES)
+
+def load_program_field_ids():
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        return profile_resolver.field_ids(cursor)
+    finally:
+        close_db_connection(conn, cursor)
+
+@app.on_event("startup")
+async def resolve_program_fields():
+    try:
+        await run_db(load_program_field_ids)
+    except Exception as e:
+        # Sin BD al arrancar: se resolverán en el primer reporte
+        # get_db_connection lanza HTTPException, cuyo str() es vacío: el motivo está en `detail`
+        logger.warning("No se pudieron resolver los campos de programa al iniciar: %s", getattr(e, "detail", e))
+
+# Versión de datos y peticiones condicionales (ETag)
+# Una consulta barata resume el estado de las tablas: para las evaluaciones, MAX(timemodified)
+# y MAX(id) (resueltos por índice); para el catálogo, conteo y CRC32 de outcomes, indicadores
+# y niveles (tablas pequeñas). La versión se comparte entre peticiones durante
+# DATA_VERSION_TTL segundos. Cuando cambia, se invalidan las cachés derivadas para que una
+# ETag nueva nunca acompañe a datos anteriores a esa versión.
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", 2))
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 60))
+
+def fetch_data_version(cursor):
+    """`(versión de evaluaciones, versión del catálogo)` vista por la conexión de `cursor` (no diccionario)"""
+    cursor.execute("""
+        SELECT
+            (SELECT MAX(timemodified) FROM mdl_gradingform_utb_evaluations),
+            (SELECT MAX(id) FROM mdl_gradingform_utb_evaluations),
+            (SELECT CONCAT_WS(':', COUNT(*), SUM(CRC32(CONCAT_WS('|', id, so_number, description_en, description_es))))
+             FROM mdl_gradingform_utb_outcomes),
+            (SELECT CONCAT_WS(':', COUNT(*), SUM(CRC32(CONCAT_WS('|', id, student_outcome_id, indicator_letter, description_en, description_es))))
+             FROM mdl_gradingform_utb_indicators),
+            (SELECT CONCAT_WS(':', COUNT(*), SUM(CRC32(CONCAT_WS('|', id, indicator_id, title_en, title_es, description_es, minscore, maxscore, sortorder))))
+             FROM mdl_gradingform_utb_lvl)
+    """)
+    row = cursor.fetchone()
+    return f"{row[0]}.{row[1]}", ".".join(str(part) for part in row[2:])
+
+class DataVersion:
+    """Versión actual de las evaluaciones y del catálogo, consultada como máximo cada `ttl` segundos."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.evaluations = None
+        self.catalog = None
+        self._checked_at = None
+        self._lock = asyncio.Lock()
+        self.checks = 0
+
+    def _load(self):
+        conn, cursor = None, None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            return fetch_data_version(cursor)
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"Error al consultar versión de datos: {str(e)}")
+        finally:
+            close_db_connection(conn, cursor)
+
+    def _is_fresh(self):
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def get(self):
+        """Retorna `(versión de evaluaciones, versión del catálogo)`"""
+        if self._is_fresh():
+            return self.evaluations, self.catalog
+        async with self._lock:
+            if not self._is_fresh():
+                evaluations, catalog = await run_db(self._load)
+                if self.catalog is not None and catalog != self.catalog:
+                    for cache in catalog_caches.values():
+                        cache.invalidate()
+                    level_index.invalidate()
+                if self.evaluations is not None and evaluations != self.evaluations:
+                    stats_store.mark_stale()
+                self.evaluations, self.catalog = evaluations, catalog
+                self._checked_at = time.monotonic()
+                self.checks += 1
+        return self.evaluations, self.catalog
+
+data_version = DataVersion(DATA_VERSION_TTL)
+
+def conditional_get(catalog_only=False, max_age=0):
+    """Dependencia que calcula la ETag de la petición y responde 304 si coincide con `If-None-Match`.
+
+    Se evalúa antes que el endpoint, así una consulta repetida no llega a agregar datos.
+    Con `catalog_only` la ETag sólo depende del catálogo (no cambia con nuevas evaluaciones).
+    """
+    cache_control = f"private, max-age={max_age}" if max_age else "private, no-cache"
+
+    async def dependency(request: Request):
+        evaluations, catalog = await data_version.get()
+        version = catalog if catalog_only else f"{evaluations}|{catalog}"
+        # La representación depende de `Accept` (JSON, MessagePack, CSV...): forma parte de la ETag
+        accept = request.headers.get("accept", "")
+        digest = hashlib.sha1(f"{version}|{request.url.path}?{request.url.query}|{accept}".encode()).hexdigest()
+        etag = f'"{digest[:24]}"'
+        request.state.etag = etag
+        request.state.cache_control = cache_control
+        if not catalog_only:
+            request.state.replica_read = ReplicaRead((evaluations, catalog))
+            replica_read.set(request.state.replica_read)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if etag in candidates or "*" in candidates:
+                raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+    return Depends(dependency)
+
+class ConditionalHeadersMiddleware:
+    """Añade `ETag` y `Cache-Control` (calculados por `conditional_get`) a las respuestas 200."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                state = scope.get("state", {})
+                read = state.get("replica_read")
+                # Datos de una réplica por detrás de la versión: sin ETag, como los de una versión anterior
+                if state.get("etag") and not (read is not None and read.behind):
+                    headers = MutableHeaders(scope=message)
+                    headers.setdefault("ETag", state["etag"])
+                    headers.setdefault("Cache-Control", state["cache_control"])
+                    headers.add_vary_header("Accept")
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+app.add_middleware(ConditionalHeadersMiddleware)
+
+# Serialización rápida (opcional)
+# Con FAST_JSON_RESPONSES los endpoints devuelven la respuesta ya codificada: FastAPI no vuelve
+# a validar las filas contra `response_model` ni las pasa por `jsonable_encoder`. Las consultas
+# ya producen exactamente los campos del esquema; lo único que el modelo cambia son los campos
+# `float`, que Pydantic convierte (un DECIMAL 3.00 se emite como 3.0 y no como 3): con `model`
+# se convierten igual antes de serializar para que el JSON resultante sea el mismo. Usa
+# orjson si está instalado y, si no, el módulo json con las mismas opciones que FastAPI.
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_default(value):
+    # Los DECIMAL de MySQL se codifican igual que en `jsonable_encoder`
+    if isinstance(value, Decimal):
+        return decimal_encoder(value)
+    raise TypeError(f"Tipo no serializable a JSON: {type(value).__name__}")
+
+def dumps_json(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que codifica con `dumps_json` (orjson si está disponible)."""
+
+    def render(self, content):
+        return dumps_json(content)
+
+@functools.lru_cache(maxsize=None)
+def model_float_fields(model):
+    """Campos de `model` anotados como `float`"""
+    return frozenset(name for name, field in model.model_fields.items() if field.annotation is float)
+
+def as_model_floats(rows, model):
+    """Filas con los campos `float` de `model` convertidos como lo haría Pydantic"""
+    fields = model_float_fields(model)
+    return [
+        {name: float(value) if name in fields and value is not None else value for name, value in row.items()}
+        for row in rows
+    ]
+
+def fast_json_response(content, headers=None, model=None):
+    """Con FAST_JSON_RESPONSES, la respuesta ya serializada; si no, el contenido para que FastAPI lo procese.
+
+    `model` es el modelo de cada fila de `response_model`, si el endpoint lo declara.
+    """
+    if not FAST_JSON_RESPONSES:
+        return content
+    if model is not None and model_float_fields(model):
+        content = as_model_floats(content, model)
+    return FastJSONResponse(content, headers=headers)
+
+# Formatos de respuesta
+# Además de JSON, los endpoints de datos pueden responder en MessagePack (si el paquete msgpack
+# está instalado) y las evaluaciones y la exportación en formato tabular: CSV o JSON por
+# columnas (`{"columns": [...], "rows": [[...], ...]}`). El formato se elige con el parámetro
+# `format` (donde existe) o con la cabecera `Accept`; sin coincidencia se responde JSON.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+RESPONSE_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "msgpack": "application/msgpack",
+    "csv": "text/csv",
+    "columns": "application/vnd.abet.columns+json",
+}
+ACCEPT_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    "text/csv": "csv",
+    "application/vnd.abet.columns+json": "columns",
+}
+TABULAR_FORMATS = ("json", "msgpack", "csv", "columns")
+
+def negotiate_format(request, allowed, explicit=None):
+    """Formato de la respuesta: `explicit` si se pidió con `format`, si no el de mayor `q` en `Accept`"""
+    if explicit:
+        if explicit == "msgpack" and msgpack is None:
+            raise HTTPException(status_code=406, detail="MessagePack no disponible: instala el paquete msgpack")
+        return explicit
+    best, best_q = "json", 0.0
+    for part in request.headers.get("accept", "").split(","):
+        media_type, _, params = part.strip().partition(";")
+        candidate = ACCEPT_FORMATS.get(media_type.strip().lower())
+        if candidate not in allowed or (candidate == "msgpack" and msgpack is None):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = candidate, q
+    return best
+
+def _msgpack_default(value):
+    if isinstance(value, Decimal):
+        return decimal_encoder(value)
+    raise TypeError(f"Tipo no serializable a MessagePack: {type(value).__name__}")
+
+def msgpack_response(content, headers=None):
+    body = msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+    return Response(body, media_type=RESPONSE_MEDIA_TYPES["msgpack"], headers=headers)
+
+def encoded_response(request, content, headers=None, model=None):
+    """Respuesta en el formato negociado (JSON o MessagePack); JSON pasa por `fast_json_response`"""
+    if negotiate_format(request, ("json", "msgpack")) == "msgpack":
+        return msgpack_response(content, headers)
+    return fast_json_response(content, headers, model)
+
+def tabular_response(response_format, columns, rows, headers=None):
+    """Filas (listas alineadas con `columns`) como CSV o como JSON por columnas"""
+    if response_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return Response(buffer.getvalue(), media_type=RESPONSE_MEDIA_TYPES["csv"], headers=headers)
+    body = dumps_json({"columns": columns, "rows": rows})
+    return Response(body, media_type=RESPONSE_MEDIA_TYPES["columns"], headers=headers)
+
+# Compresión de respuestas
+# gzip (y brotli si el paquete está instalado) según `Accept-Encoding`, sólo para respuestas de
+# al menos COMPRESSION_MIN_SIZE bytes. Las respuestas en streaming (NDJSON) se comprimen por
+# bloques para que el cliente siga recibiendo las líneas a medida que se generan.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def choose_encoding(accept_encoding):
+    """`br`, `gzip` o None según las codificaciones aceptadas (respetando `q=0`)"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+class _Compressor:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        """Comprimir un bloque y vaciar el buffer para que pueda enviarse ya"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+class CompressionMiddleware:
+    """Comprime el cuerpo de las respuestas según `Accept-Encoding`."""
+
+    def __init__(self, app, minimum_size):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        def compressed_start(message):
+            headers = MutableHeaders(scope=message)
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["content-length"]
+            # La misma ETag sirve para todas las codificaciones: se marca como débil
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            return headers
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = Headers(raw=start_message["headers"])
+                # Los eventos SSE se envían tal cual: comprimirlos retrasaría cada mensaje
+                if ("content-encoding" in headers or start_message["status"] in (204, 304)
+                        or headers.get("content-type", "").startswith("text/event-stream")
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = compressed_start(start_message)
+                if not more_body:
+                    body = compressor.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            if more_body:
+                await send({"type": "http.response.body", "body": compressor.chunk(body), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, send_compressed)
+
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Caché compartida de payloads
+# Reportes, assessments y charts calculados se guardan en un backend intercambiable: en memoria
+# (por proceso) o Redis (compartido entre workers y réplicas). Cada entrada lleva la versión de
+# datos con la que se calculó; vale mientras esa versión siga vigente y no pasen
+# PAYLOAD_CACHE_TTL segundos. Al expirar, un solo cálculo por clave ("single-flight"): dentro
+# del proceso las peticiones comparten la misma tarea y entre workers un candado en el backend
+# decide quién recalcula; los demás sirven la versión anterior (sin ETag) o esperan el resultado.
+PAYLOAD_CACHE_BACKEND = os.getenv("PAYLOAD_CACHE_BACKEND", "memory").lower()
+PAYLOAD_CACHE_TTL = float(os.getenv("PAYLOAD_CACHE_TTL", 60))
+PAYLOAD_CACHE_STALE_TTL = float(os.getenv("PAYLOAD_CACHE_STALE_TTL", 300))
+PAYLOAD_CACHE_MAX_ENTRIES = int(os.getenv("PAYLOAD_CACHE_MAX_ENTRIES", 500))
+PAYLOAD_CACHE_LOCK_TTL = float(os.getenv("PAYLOAD_CACHE_LOCK_TTL", 30))
+PAYLOAD_CACHE_WAIT = float(os.getenv("PAYLOAD_CACHE_WAIT", 10))
+PAYLOAD_CACHE_PREFIX = os.getenv("PAYLOAD_CACHE_PREFIX", "abet:")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+class MemoryCacheBackend:
+    """Backend por proceso sobre TTLCache; el candado sólo coordina tareas del mismo proceso."""
+
+    name = "memory"
+
+    def __init__(self, ttl, max_entries):
+        self.entries = TTLCache(ttl, max_entries)
+        self._locks = {}
+
+    async def get(self, key):
+        found, entry = self.entries.get(key)
+        return entry if found else None
+
+    async def set(self, key, entry, ttl):
+        # La expiración es la de la caché (PAYLOAD_CACHE_TTL + PAYLOAD_CACHE_STALE_TTL)
+        self.entries.set(key, entry)
+
+    async def acquire_lock(self, key, ttl):
+        now = time.monotonic()
+        if self._locks.get(key, 0) > now:
+            return None
+        self._locks[key] = now + ttl
+        return "local"
+
+    async def locked(self, key):
+        return self._locks.get(key, 0) > time.monotonic()
+
+    async def release_lock(self, key, token):
+        self._locks.pop(key, None)
+
+    async def clear(self):
+        return self.entries.invalidate()
+
+    def stats(self):
+        status = self.entries.stats()
+        status.pop("keys")
+        return status
+
+class RedisCacheBackend:
+    """Backend compartido en Redis (o un servidor compatible); `client` es un cliente de `redis.asyncio`."""
+
+    name = "redis"
+
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+
+    def _lock_key(self, key):
+        return f"{self.prefix}lock:{key}"
+
+    async def get(self, key):
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key, entry, ttl):
+        await self.client.set(self.prefix + key, dumps_json(entry), px=int(ttl * 1000))
+
+    async def acquire_lock(self, key, ttl):
+        token = secrets.token_hex(8)
+        acquired = await self.client.set(self._lock_key(key), token, nx=True, px=int(ttl * 1000))
+        return token if acquired else None
+
+    async def locked(self, key):
+        return await self.client.exists(self._lock_key(key)) > 0
+
+    async def release_lock(self, key, token):
+        # Sólo se borra el candado propio: si expiró, puede pertenecer ya a otro worker
+        current = await self.client.get(self._lock_key(key))
+        if current is not None and current.decode() == token:
+            await self.client.delete(self._lock_key(key))
+
+    async def clear(self):
+        removed = 0
+        async for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            removed += await self.client.delete(key)
+        return removed
+
+    def stats(self):
+        return {"url": REDIS_URL.split("@")[-1], "prefix": self.prefix}
+
+def create_payload_backend():
+    if PAYLOAD_CACHE_BACKEND == "none":
+        return None
+    if PAYLOAD_CACHE_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError("PAYLOAD_CACHE_BACKEND=redis requiere el paquete redis")
+        return RedisCacheBackend(redis_asyncio.from_url(REDIS_URL), PAYLOAD_CACHE_PREFIX)
+    if PAYLOAD_CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(PAYLOAD_CACHE_TTL + PAYLOAD_CACHE_STALE_TTL, PAYLOAD_CACHE_MAX_ENTRIES)
+    raise RuntimeError(f"PAYLOAD_CACHE_BACKEND desconocido: '{PAYLOAD_CACHE_BACKEND}' (memory, redis o none)")
+
+class PayloadCache:
+    """Payloads calculados por versión de datos, con un solo cálculo concurrente por clave."""
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, backend, ttl, stale_ttl, lock_ttl, wait):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_ttl = lock_ttl
+        self.wait = wait
+        self._inflight = {}
+        # clave -> (último acceso, loader, args) de las peticiones de clientes, para el precalentamiento
+        self._recent = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.waited = 0
+        self.replica_behind = 0
+        self.backend_errors = 0
+
+    def _is_fresh(self, entry, version):
+        return entry is not None and entry["version"] == version and time.time() - entry["stored_at"] < self.ttl
+
+    async def _read(self, key):
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            # Backend caído: se calcula sin caché en lugar de fallar la petición
+            self.backend_errors += 1
+            logger.warning("Caché de payloads no disponible (%s): %s", self.backend.name, e)
+            return None
+
+    async def get_or_build(self, request, key, loader, *args):
+        """Payload de `key`; `request` puede ser None (precalentamiento)"""
+        if self.backend is None:
+            return await self._call(loader, args)
+        if request is not None:
+            self._record_access(key, loader, args)
+        evaluations, catalog = await data_version.get()
+        version = f"{evaluations}|{catalog}"
+        entry = await self._read(key)
+        if self._is_fresh(entry, version):
+            self.hits += 1
+            return entry["value"]
+
+        self.misses += 1
+        # La versión forma parte de la clave: una petición que ya ve datos nuevos no se une a
+        # un cálculo lanzado con la versión anterior
+        inflight_key = (key, version)
+        task = self._inflight.get(inflight_key)
+        if task is None:
+            task = asyncio.ensure_future(self._rebuild(key, (evaluations, catalog), entry, loader, args))
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        else:
+            self.coalesced += 1
+        value, stale = await asyncio.shield(task)
+        if stale and request is not None:
+            # Datos de una versión anterior: sin ETag para que el cliente no los guarde como actuales
+            request.state.etag = None
+        return value
+
+    def _record_access(self, key, loader, args):
+        self._recent[key] = (time.monotonic(), loader, args)
+        self._recent.move_to_end(key)
+        while len(self._recent) > PAYLOAD_CACHE_MAX_ENTRIES:
+            self._recent.popitem(last=False)
+
+    def hot_entries(self, window):
+        """`(clave, loader, args)` pedidas por clientes en los últimos `window` segundos"""
+        cutoff = time.monotonic() - window
+        return [(key, loader, args) for key, (accessed_at, loader, args) in self._recent.items() if accessed_at >= cutoff]
+
+    async def is_fresh(self, key):
+        """Si `key` está guardada con la versión de datos actual y sin expirar"""
+        evaluations, catalog = await data_version.get()
+        return self._is_fresh(await self._read(key), f"{evaluations}|{catalog}")
+
+    async def _store(self, key, version, value):
+        entry = {"version": version, "stored_at": time.time(), "value": value}
+        try:
+            await self.backend.set(key, entry, self.ttl + self.stale_ttl)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning("No se pudo guardar en la caché de payloads (%s): %s", self.backend.name, e)
+
+    @staticmethod
+    async def _call(loader, args):
+        """Los loaders síncronos van al ejecutor de BD; los asíncronos reparten su propio trabajo"""
+        if asyncio.iscoroutinefunction(loader):
+            return await loader(*args)
+        return await run_db(loader, *args)
+
+    async def _build(self, key, version, loader, args):
+        """Calcular y guardar; retorna `(valor, es_anterior)`.
+
+        Un cálculo leído en una réplica por detrás de `version` no se guarda y se sirve sin ETag.
+        """
+        read = ReplicaRead(version)
+        replica_read.set(read)
+        value = await self._call(loader, args)
+        if read.behind:
+            self.replica_behind += 1
+            return value, True
+        await self._store(key, "|".join(version), value)
+        return value, False
+
+    async def _rebuild(self, key, version, entry, loader, args):
+        """Retorna `(valor, es_anterior)`; `version` es `(evaluaciones, catálogo)`"""
+        try:
+            token = await self.backend.acquire_lock(key, self.lock_ttl)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning("No se pudo tomar el candado de la caché de payloads (%s): %s", self.backend.name, e)
+            return await self._build(key, version, loader, args)
+
+        if token is not None:
+            try:
+                return await self._build(key, version, loader, args)
+            finally:
+                try:
+                    await self.backend.release_lock(key, token)
+                except Exception:
+                    pass
+
+        # Otro worker está recalculando esta clave
+        if entry is not None:
+            self.stale_served += 1
+            return entry["value"], True
+        self.waited += 1
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            entry = await self._read(key)
+            if self._is_fresh(entry, "|".join(version)):
+                return entry["value"], False
+            if not await self.backend.locked(key):
+                break
+        # El otro worker falló o tarda demasiado: calcularlo aquí
+        return await self._build(key, version, loader, args)
+
+    async def clear(self):
+        if self.backend is None:
+            return 0
+        return await self.backend.clear()
+
+    def stats(self):
+        return {
+            "backend": self.backend.name if self.backend else "none",
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "waited_for_other_worker": self.waited,
+            "not_stored_replica_behind": self.replica_behind,
+            "backend_errors": self.backend_errors,
+            "in_flight": len(self._inflight),
+            "store": self.backend.stats() if self.backend else None,
+        }
+
+payload_cache = PayloadCache(create_payload_backend(), PAYLOAD_CACHE_TTL, PAYLOAD_CACHE_STALE_TTL, PAYLOAD_CACHE_LOCK_TTL, PAYLOAD_CACHE_WAIT)
+
+def payload_key(kind, outcome_id, scope):
+    """Clave estable del payload: tipo, outcome y filtros (ordenados)"""
+    filters = "&".join(f"{name}={value}" for name, value in sorted((scope or {}).items()) if value is not None)
+    return f"{kind}:{outcome_id}?{filters}"
+
+# Reporte en paralelo
+# Las partes del reporte (indicadores con sus conteos, cursos y profesores, estudiantes
+# calificados con su programa) son independientes: cada una se ejecuta en su propia conexión
+# del pool, con a lo sumo REPORT_FANOUT_CONCURRENCY a la vez por reporte (menos si no cabe en el
+# presupuesto de "Control de admisión"), de modo que la latencia se acerca a la de la parte más lenta. Con réplicas de lectura las partes comparten
+# una conexión para no mezclar réplicas con distinto retraso. Si el reporte completo tarda más
+# de REPORT_TIMEOUT segundos se responde 504 (0 para no limitar).
+REPORT_FANOUT_CONCURRENCY = max(1, int(os.getenv("REPORT_FANOUT_CONCURRENCY", 3)))
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", 30))
+
+# Control de admisión
+# Las rutas pesadas (reportes, assessments, charts, batch y exportación) tienen cada una un
+# máximo de peticiones en curso por proceso y una cola de espera acotada. Si la cola está llena
+# o la espera supera ADMISSION_QUEUE_TIMEOUT, la petición recibe de inmediato 503 con
+# Retry-After: así unos pocos reportes grandes no acaparan los hilos y conexiones que necesitan
+# /api/outcomes o /api/levels. ADMISSION_ROUTE_LIMITS ajusta el máximo por ruta ("report=2,export=1").
+#
+# Presupuesto de hilos: una petición admitida ocupa un hilo del ejecutor de BD, y un reporte
+# hasta REPORT_FANOUT_CONCURRENCY. La suma de límite × hilos de todas las rutas no puede superar
+# DB_MAX_WORKERS - ADMISSION_RESERVED_WORKERS; los hilos reservados quedan para el catálogo,
+# /health y las tareas de fondo. Sin ADMISSION_CONCURRENCY, el límite de cada ruta se deriva de
+# ese presupuesto. Con un pool pequeño se reducen primero las partes simultáneas del reporte y,
+# si aun así no cabe una petición por ruta, las rutas quedan con límite 1 y se avisa al arrancar.
+# Solo un ADMISSION_CONCURRENCY o ADMISSION_ROUTE_LIMITS configurado que excede el presupuesto
+# impide arrancar.
+ADMISSION_RESERVED_WORKERS = int(os.getenv("ADMISSION_RESERVED_WORKERS", max(2, DB_MAX_WORKERS // 4)))
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY") or 0)
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 8))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 5))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 2))
+ADMISSION_ROUTES = ("report", "assessment", "chart", "batch", "export")
+
+def parse_route_limits(raw):
+    """"report=2,export=1" -> {"report": 2, "export": 1}"""
+    limits = {}
+    for item in raw.split(","):
+        if item.strip():
+            name, _, limit = item.partition("=")
+            limits[name.strip()] = int(limit)
+    return limits
+
+class AdmissionLimiter:
+    """Peticiones en curso de una ruta con cola de espera acotada; rechaza con 503 al saturarse."""
+
+    def __init__(self, name, limit, queue_size, queue_timeout):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.background = 0
+
+    def _reject(self):
+        return HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, intente de nuevo en unos segundos",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+        )
+
+    async def acquire(self):
+        if self._semaphore.locked() and self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise self._reject()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise self._reject()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+
+    async def try_acquire(self):
+        """Ocupar un lugar sólo si hay uno libre y nadie espera; para tareas de fondo, sin 503"""
+        if self._semaphore.locked() or self.waiting:
+            return False
+        # Con el semáforo libre, `acquire` no cede el event loop: nadie puede adelantarse
+        await self._semaphore.acquire()
+        self.active += 1
+        self.background += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {
+            "route": self.name,
+            "limit": self.limit,
+            "db_threads_per_request": admission_route_cost(self.name),
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "background": self.background,
+        }
+
+def admission_route_cost(name, fanout=None):
+    """Hilos del ejecutor que ocupa una petición de la ruta"""
+    # Con réplicas el reporte usa una sola conexión (ver "Reporte en paralelo")
+    if name == "report" and not replica_router.replicas:
+        return report_fanout if fanout is None else fanout
+    return 1
+
+def admission_budget():
+    return DB_MAX_WORKERS - ADMISSION_RESERVED_WORKERS
+
+def describe_admission_budget():
+    return (f"{admission_budget()} (DB_MAX_WORKERS={DB_MAX_WORKERS} - "
+            f"ADMISSION_RESERVED_WORKERS={ADMISSION_RESERVED_WORKERS})")
+
+def plan_admission(route_limits):
+    """Límites por ruta y partes simultáneas por reporte que caben en el presupuesto de hilos.
+
+    Devuelve `(límites, partes por reporte, avisos, error)`. Los valores derivados se ajustan
+    con un aviso; `error` solo se llena si un límite configurado no cabe en el presupuesto.
+    """
+    budget = admission_budget()
+    configured = {}
+    for name in ADMISSION_ROUTES:
+        if name in route_limits:
+            configured[name] = route_limits[name]
+        elif ADMISSION_CONCURRENCY > 0:
+            configured[name] = ADMISSION_CONCURRENCY
+    derived = [name for name in ADMISSION_ROUTES if name not in configured]
+
+    def used(fanout, names):
+        # Las rutas derivadas cuentan con su mínimo de 1 petición
+        return sum(configured.get(name, 1) * admission_route_cost(name, fanout) for name in names)
+
+    fanout = REPORT_FANOUT_CONCURRENCY
+    while fanout > 1 and used(fanout, ADMISSION_ROUTES) > budget:
+        fanout -= 1
+    warnings = []
+    if fanout < REPORT_FANOUT_CONCURRENCY:
+        warnings.append(
+            f"REPORT_FANOUT_CONCURRENCY={REPORT_FANOUT_CONCURRENCY} no cabe en el presupuesto de admisión "
+            f"{describe_admission_budget()}: cada reporte consultará {fanout} parte(s) a la vez"
+        )
+
+    configured_used = used(fanout, configured)
+    if configured_used > budget:
+        settings = [setting for setting, applies in (
+            ("ADMISSION_CONCURRENCY", any(name not in route_limits for name in configured)),
+            ("ADMISSION_ROUTE_LIMITS", bool(route_limits)),
+        ) if applies]
+        limits = ", ".join(f"{name}={limit}" for name, limit in configured.items())
+        error = (
+            f"{' y '.join(settings)} ({limits}) ocupa(n) hasta {configured_used} hilos de BD y el "
+            f"presupuesto es {describe_admission_budget()}: baja {' o '.join(settings)} o sube DB_MAX_WORKERS"
+        )
+        return {**configured, **dict.fromkeys(derived, 1)}, fanout, warnings, error
+
+    limits = dict(configured)
+    if derived:
+        remaining = budget - configured_used
+        derived_cost = sum(admission_route_cost(name, fanout) for name in derived)
+        limits.update(dict.fromkeys(derived, max(1, remaining // derived_cost)))
+        if derived_cost > remaining:
+            warnings.append(
+                f"Con una petición a la vez, {', '.join(derived)} ocupan hasta {derived_cost} hilos de BD y "
+                f"quedan {max(remaining, 0)} del presupuesto {describe_admission_budget()}: las rutas pesadas "
+                f"pueden usar los hilos reservados; sube DB_POOL_SIZE o DB_MAX_WORKERS"
+            )
+    return limits, fanout, warnings, None
+
+_route_limits = parse_route_limits(os.getenv("ADMISSION_ROUTE_LIMITS", ""))
+_admission_limits, report_fanout, _admission_warnings, _admission_error = plan_admission(_route_limits)
+admission_limiters = {
+    name: AdmissionLimiter(name, _admission_limits[name], ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+    for name in ADMISSION_ROUTES
+}
+
+@app.on_event("startup")
+def check_admission_budget():
+    for warning in _admission_warnings:
+        logger.warning(warning)
+    if _admission_error:
+        raise RuntimeError(_admission_error)
+
+def admission_control(name):
+    """Dependencia que ocupa un lugar del limitador `name` mientras se atiende la petición.
+
+    Va después de `conditional_get`: las respuestas 304 no consumen lugar.
+    """
+    limiter = admission_limiters[name]
+
+    async def dependency():
+        await limiter.acquire()
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    return Depends(dependency)
+
+# Endpoints
+def check_db_health():
+    """Comprobar la conexión a la BD con un `SELECT 1`"""
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        return {"status": "healthy"}
+    except Exception as e:
+        return {"status": "unhealthy", "error": str(e)}
+    finally:
+        close_db_connection(conn, cursor)
+
+# Estado de salud en segundo plano
+# Una tarea comprueba la BD cada HEALTH_CHECK_INTERVAL segundos con una conexión del pool;
+# las sondas (/health, /health/live, /health/ready) sólo leen el último resultado. La
+# readiness falla si la última comprobación correcta tiene más de HEALTH_MAX_STALENESS segundos.
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", 10))
+HEALTH_MAX_STALENESS = float(os.getenv("HEALTH_MAX_STALENESS", HEALTH_CHECK_INTERVAL * 3))
+
+class HealthMonitor:
+    """Último estado conocido de la BD, refrescado por una tarea de fondo."""
+
+    def __init__(self, interval, max_staleness):
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.result = None
+        self.last_check = None
+        self.last_success = None
+        self.latency = None
+        self.checks = 0
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def check(self):
+        start = time.monotonic()
+        try:
+            result = await run_db(check_db_health)
+        except Exception as e:
+            # Ejecutor cerrado o saturado: se registra como fallo, la tarea sigue viva
+            result = {"status": "unhealthy", "error": str(e)}
+        now = time.monotonic()
+        self.result = result
+        self.last_check = now
+        self.latency = now - start
+        self.checks += 1
+        if result["status"] == "healthy":
+            self.last_success = now
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def current(self):
+        """Último resultado; sólo consulta la BD si todavía no hay ninguno (arranque en frío)"""
+        if self.result is None:
+            async with self._lock:
+                if self.result is None:
+                    await self.check()
+        return self.result
+
+    def is_ready(self):
+        return self.last_success is not None and time.monotonic() - self.last_success <= self.max_staleness
+
+    def snapshot(self):
+        now = time.monotonic()
+        database = dict(self.result or {"status": "unknown"})
+        database["last_success_age_seconds"] = round(now - self.last_success, 3) if self.last_success is not None else None
+        database["last_check_age_seconds"] = round(now - self.last_check, 3) if self.last_check is not None else None
+        database["latency_ms"] = round(self.latency * 1000, 2) if self.latency is not None else None
+        database["check_interval_seconds"] = self.interval
+        database["background_checker"] = self._task is not None and not self._task.done()
+        pool = db_pool.stats()
+        capacity = pool["size"] + pool["max_overflow"]
+        return {
+            "status": "ready" if self.is_ready() else "not_ready",
+            "database": database,
+            "pool": {
+                "in_use": pool["in_use"],
+                "open": pool["open"],
+                "idle": pool["idle"],
+                "capacity": capacity,
+                "saturation": round(pool["in_use"] / capacity, 3) if capacity else None,
+                "timeouts": pool["timeouts"],
+            },
+        }
+
+health_monitor = HealthMonitor(HEALTH_CHECK_INTERVAL, HEALTH_MAX_STALENESS)
+
+@app.on_event("startup")
+async def start_health_monitor():
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_health_monitor():
+    await health_monitor.stop()
+
+@app.get("/health")
+async def health_check():
+    return await health_monitor.current()
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: el proceso atiende peticiones (no toca la BD)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: estado cacheado de la BD, saturación del pool y progreso del precalentamiento;
+    503 si la BD no responde (o, con WARMUP_REQUIRED_FOR_READY, si las cachés aún no están listas)"""
+    await health_monitor.current()
+    snapshot = health_monitor.snapshot()
+    snapshot["warmup"] = cache_warmer.stats()
+    if snapshot["status"] == "ready" and WARMUP_ENABLED and WARMUP_REQUIRED_FOR_READY and not cache_warmer.warmed:
+        snapshot["status"] = "warming_up"
+    return JSONResponse(status_code=200 if snapshot["status"] == "ready" else 503, content=snapshot)
+
+@app.get("/metrics", dependencies=[Depends(verify_admin_key)])
+def get_metrics():
+    """Métricas por ruta y del pool en formato de texto de Prometheus"""
+    admission = [limiter.stats() for limiter in admission_limiters.values()]
+    return Response(content=metrics_registry.render(db_pool.stats(), admission), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/db-pool", dependencies=[Depends(verify_api_key)])
+def get_db_pool_stats():
+    """Estadísticas del pool de conexiones (en uso, libres, tiempos de espera) y de las réplicas"""
+    stats = db_pool.stats()
+    if replica_router.replicas:
+        stats["read_replicas"] = replica_router.stats()
+    return stats
+
+# Índice de profesores
+# Relación profesor -> cursos -> outcomes precalculada en memoria para filtrar /api/outcomes
+# sin recorrer las evaluaciones en cada petición. Los nombres se normalizan (minúsculas, sin
+# tildes) y se indexan por palabra para buscar por prefijo con `bisect`.
+TEACHER_INDEX_TTL = int(os.getenv("TEACHER_INDEX_TTL", 300))
+
+def fold_text(text):
+    """Minúsculas y sin tildes: 'José Pérez' -> 'jose perez'"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+def name_tokens(text):
+    return re.findall(r"\w+", fold_text(text))
+
+class TeacherIndex:
+    """Índice en memoria de profesores, sus cursos y los outcomes evaluados en esos cursos."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._outcomes = {}
+        self._teacher_outcomes = {}
+        self._tokens = []
+        self._built_at = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_seconds = None
+
+    def _build(self, cursor):
+        started = time.monotonic()
+        cursor.execute("SELECT id, so_number, description_es AS description FROM mdl_gradingform_utb_outcomes")
+        outcomes = {row["id"]: row for row in cursor.fetchall()}
+
+        cursor.execute(f"""
+            SELECT {STATEMENT_TIMEOUT_HINT}e.courseid, i.student_outcome_id
+            FROM mdl_gradingform_utb_evaluations e
+            JOIN mdl_gradingform_utb_indicators i ON i.id = e.indicator_id
+            GROUP BY e.courseid, i.student_outcome_id
+        """)
+        course_outcomes = {}
+        for row in cursor.fetchall():
+            course_outcomes.setdefault(row["courseid"], set()).add(row["student_outcome_id"])
+
+        teacher_outcomes = {}
+        tokens = set()
+        for chunk in _chunks(list(course_outcomes), USER_LOOKUP_CHUNK_SIZE):
+            cursor.execute(f"""
+                SELECT DISTINCT u.id, u.firstname, u.lastname, c.instanceid AS courseid
+                FROM mdl_role_assignments ra
+                JOIN mdl_context c ON c.id = ra.contextid AND c.contextlevel = 50
+                JOIN mdl_role r ON r.id = ra.roleid
+                JOIN mdl_user u ON u.id = ra.userid
+                WHERE r.shortname LIKE %s AND c.instanceid IN ({_in_placeholders(chunk)})
+            """, ("%teacher%",) + tuple(chunk))
+            for row in cursor.fetchall():
+                teacher_outcomes.setdefault(row["id"], set()).update(course_outcomes[row["courseid"]])
+                for token in name_tokens(f"{row['firstname']} {row['lastname']}"):
+                    tokens.add((token, row["id"]))
+
+        self._outcomes = outcomes
+        self._teacher_outcomes = teacher_outcomes
+        self._tokens = sorted(tokens)
+        self._built_at = time.monotonic()
+        self.builds += 1
+        self.build_seconds = round(self._built_at - started, 3)
+
+    def ensure_fresh(self, cursor):
+        if self._built_at is not None and time.monotonic() - self._built_at < self.ttl:
+            return
+        # Si otro hilo ya está reconstruyendo, seguir usando el índice actual
+        if not self._lock.acquire(blocking=self._built_at is None):
+            return
+        try:
+            if self._built_at is None or time.monotonic() - self._built_at >= self.ttl:
+                self._build(cursor)
+        finally:
+            self._lock.release()
+
+    def _teachers_with_prefix(self, prefix):
+        tokens = self._tokens
+        start = bisect.bisect_left(tokens, (prefix,))
+        found = set()
+        # Por índice desde `start`: islice recorrería la lista desde el principio
+        for i in range(start, len(tokens)):
+            token, teacher_id = tokens[i]
+            if not token.startswith(prefix):
+                break
+            found.add(teacher_id)
+        return found
+
+    def find_by_name(self, name):
+        """Profesores cuyo nombre contiene una palabra que empieza por cada palabra buscada"""
+        teacher_ids = None
+        for prefix in name_tokens(name):
+            matches = self._teachers_with_prefix(prefix)
+            teacher_ids = matches if teacher_ids is None else teacher_ids & matches
+            if not teacher_ids:
+                return set()
+        return teacher_ids or set()
+
+    def outcomes_for(self, teacher_ids):
+        outcome_ids = set()
+        for teacher_id in teacher_ids:
+            outcome_ids |= self._teacher_outcomes.get(teacher_id, set())
+        return [self._outcomes[outcome_id] for outcome_id in sorted(outcome_ids) if outcome_id in self._outcomes]
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def stats(self):
+        return {
+            "teachers": len(self._teacher_outcomes),
+            "name_tokens": len(self._tokens),
+            "builds": self.builds,
+            "build_seconds": self.build_seconds,
+            "ttl_seconds": self.ttl,
+        }
+
+teacher_index = TeacherIndex(TEACHER_INDEX_TTL)
+
+def load_outcomes(teacher_id, teacher_name):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        # Sin filtro, devolver todos los outcomes
+        if not teacher_id and not teacher_name:
+            cursor.execute("SELECT id, so_number, description_es AS description FROM mdl_gradingform_utb_outcomes")
+            return cursor.fetchall()
+
+        # Con filtro por profesor: outcomes con evaluaciones en cursos donde ese usuario
+        # está asignado como profesor, resueltos con el índice en memoria
+        teacher_index.ensure_fresh(cursor)
+        if teacher_id:
+            return teacher_index.outcomes_for([teacher_id])
+        return teacher_index.outcomes_for(teacher_index.find_by_name(teacher_name))
+    except Error as e:
+        # La construcción del índice agrega las evaluaciones: si supera el tiempo máximo, 503
+        raise query_error(e, "Error al construir el índice de profesores")
+    finally:
+        close_db_connection(conn, cursor)
+
+@app.get("/api/outcomes", response_model=List[StudentOutcome], dependencies=[Depends(verify_api_key), conditional_get(max_age=CATALOG_MAX_AGE)])
+async def get_outcomes(request: Request, teacher_id: Optional[int] = Query(None), teacher_name: Optional[str] = Query(None)):
+    """Listar outcomes. Opcionalmente filtrar por profesor (`teacher_id` o `teacher_name`).
+    El filtrado busca outcomes que tengan evaluaciones en cursos donde el usuario
+    está asignado con un rol cuyo `shortname` contiene 'teacher'. `teacher_name` busca
+    por prefijo de cada palabra, sin distinguir mayúsculas ni tildes ("jose per").
+    """
+    if not teacher_id and not teacher_name:
+        return encoded_response(request, await cached_catalog(catalog_caches["outcomes"], "all", load_outcomes, None, None))
+    return encoded_response(request, await run_db(load_outcomes, teacher_id, teacher_name))
+
+def load_indicators(outcome_id):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        # Obtener indicadores (retorna lista vacía si no hay)
+        cursor.execute("SELECT id, student_outcome_id, indicator_letter, description_es AS description FROM mdl_gradingform_utb_indicators WHERE student_outcome_id = %s", (outcome_id,))
+        results = cursor.fetchall()
+        return results
+    except HTTPException:
+        raise
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar indicadores: {str(e)}")
+    finally:
+        close_db_connection(conn, cursor)
+
+@app.get("/api/indicators/{outcome_id:path}", response_model=List[PerformanceIndicator], dependencies=[Depends(verify_api_key), conditional_get(catalog_only=True, max_age=CATALOG_MAX_AGE)])
+async def get_indicators(outcome_id: str, request: Request):
+    """Obtener todos los indicadores de un outcome específico"""
+    outcome_id = parse_path_id(outcome_id)
+    return encoded_response(request, await cached_catalog(catalog_caches["indicators"], outcome_id, load_indicators, outcome_id))
+
+def load_levels(indicator_id):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        # Obtener niveles y mapear los campos correctamente
+        cursor.execute("""
+            SELECT id, indicator_id, 
+                   title_es AS title, 
+                   description_es AS description, 
+                   minscore, maxscore
+            FROM mdl_gradingform_utb_lvl 
+            WHERE indicator_id = %s 
+            ORDER BY sortorder DESC
+        """, (indicator_id,))
+        results = cursor.fetchall()
+        return results
+    except HTTPException:
+        raise
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar niveles: {str(e)}")
+    finally:
+        close_db_connection(conn, cursor)
+
+@app.get("/api/levels/{indicator_id:path}", response_model=List[PerformanceLevel], dependencies=[Depends(verify_api_key), conditional_get(catalog_only=True, max_age=CATALOG_MAX_AGE)])
+async def get_levels(indicator_id: str, request: Request):
+    """Obtener todos los niveles de desempeño de un indicador específico"""
+    indicator_id = parse_path_id(indicator_id)
+    return encoded_response(request, await cached_catalog(catalog_caches["levels"], indicator_id, load_levels, indicator_id), model=PerformanceLevel)
+
+def load_evaluations(student_id):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        cursor.execute("""
+            SELECT id, instanceid, studentid, courseid, activityid, activityname,
+                   student_outcome_id, indicator_id, performance_level_id, 
+                   score, feedback, timecreated, timemodified
+            FROM mdl_gradingform_utb_evaluations
+            WHERE studentid = %s
+            ORDER BY timecreated DESC
+        """, (student_id,))
+        results = cursor.fetchall()
+        
+        # Retorna lista vacía si no hay evaluaciones (no es error)
+        return results
+    except HTTPException:
+        raise
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar evaluaciones: {str(e)}")
+    finally:
+        close_db_connection(conn, cursor)
+
+# Paginación por cursor de evaluaciones
+# Las páginas se ordenan por (timecreated, id) descendente y el cursor codifica la última
+# fila entregada, así cada página es una búsqueda por índice sin OFFSET.
+EVALUATIONS_MAX_PAGE_SIZE = int(os.getenv("EVALUATIONS_MAX_PAGE_SIZE", 1000))
+EVALUATIONS_STREAM_BATCH = int(os.getenv("EVALUATIONS_STREAM_BATCH", 500))
+
+EVALUATION_COLUMNS = list(EvaluationResult.model_fields)
+
+def encode_evaluations_cursor(row):
+    raw = json.dumps([row["timecreated"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_evaluations_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        timecreated, evaluation_id = json.loads(raw)
+        return int(timecreated), int(evaluation_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail=f"Cursor inválido: '{token}'")
+
+def load_evaluations_page(student_id, limit, after):
+    """Hasta `limit` evaluaciones del estudiante posteriores (en orden descendente) a `after`"""
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        keyset = ""
+        params = [student_id]
+        if after:
+            keyset = "AND (timecreated < %s OR (timecreated = %s AND id < %s))"
+            params += [after[0], after[0], after[1]]
+        cursor.execute(f"""
+            SELECT id, instanceid, studentid, courseid, activityid, activityname,
+                   student_outcome_id, indicator_id, performance_level_id, 
+                   score, feedback, timecreated, timemodified
+            FROM mdl_gradingform_utb_evaluations
+            WHERE studentid = %s {keyset}
+            ORDER BY timecreated DESC, id DESC
+            LIMIT %s
+        """, tuple(params + [limit]))
+        return cursor.fetchall()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar evaluaciones: {str(e)}")
+    finally:
+        close_db_connection(conn, cursor)
+
+async def stream_evaluations_ndjson(student_id, after):
+    """Todas las evaluaciones en NDJSON, leídas por páginas para mantener la memoria acotada"""
+    while True:
+        rows = await run_db(load_evaluations_page, student_id, EVALUATIONS_STREAM_BATCH, after)
+        if not rows:
+            return
+        if FAST_JSON_RESPONSES:
+            yield b"".join(dumps_json(row) + b"\n" for row in rows)
+        else:
+            yield "".join(EvaluationResult.model_validate(row).model_dump_json() + "\n" for row in rows)
+        if len(rows) < EVALUATIONS_STREAM_BATCH:
+            return
+        after = (rows[-1]["timecreated"], rows[-1]["id"])
+
+@app.get("/api/evaluations/{student_id:path}", response_model=List[EvaluationResult], dependencies=[Depends(verify_api_key), conditional_get()])
+async def get_evaluations(
+    student_id: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=EVALUATIONS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    response_format: Optional[str] = Query(None, alias="format", pattern="^(json|ndjson|msgpack|csv|columns)$"),
+):
+    """Obtener todas las evaluaciones de un estudiante específico por su ID.
+
+    - `limit`: paginar por cursor; la siguiente página se indica en `X-Next-Cursor` y `Link`.
+    - `cursor`: continuar desde la página anterior.
+    - `format=ndjson`: transmitir el historial completo como NDJSON (una evaluación por línea).
+    - `format=msgpack|csv|columns` (o la cabecera `Accept`): MessagePack, CSV o JSON por columnas.
+    """
+    student_id = parse_path_id(student_id)
+    after = decode_evaluations_cursor(cursor) if cursor else None
+    response_format = negotiate_format(request, ("ndjson",) + TABULAR_FORMATS, response_format)
+
+    if response_format == "ndjson":
+        return StreamingResponse(stream_evaluations_ndjson(student_id, after), media_type="application/x-ndjson")
+
+    headers = {}
+    if limit is None and after is None:
+        rows = await run_db(load_evaluations, student_id)
+    else:
+        page_size = limit or EVALUATIONS_MAX_PAGE_SIZE
+        rows = await run_db(load_evaluations_page, student_id, page_size + 1, after)
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_evaluations_cursor(rows[-1])
+            headers["X-Next-Cursor"] = next_cursor
+            next_url = request.url.include_query_params(cursor=next_cursor, limit=page_size)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+    if response_format in ("csv", "columns"):
+        table = [[row[column] for column in EVALUATION_COLUMNS] for row in rows]
+        return tabular_response(response_format, EVALUATION_COLUMNS, table, headers)
+    if response_format == "msgpack":
+        return msgpack_response(rows, headers)
+    response.headers.update(headers)
+    return fast_json_response(rows, headers, EvaluationResult)
+
+def load_outcome_summary(outcome_id):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM mdl_gradingform_utb_outcomes WHERE id = %s", (outcome_id,))
+        outcome = cursor.fetchone()
+        if not outcome:
+            raise HTTPException(status_code=404, detail="Outcome no encontrado")
+        cursor.execute("SELECT * FROM mdl_gradingform_utb_indicators WHERE student_outcome_id = %s", (outcome_id,))
+        indicators = cursor.fetchall()
+        for indicator in indicators:
+            cursor.execute("SELECT * FROM mdl_gradingform_utb_lvl WHERE indicator_id = %s", (indicator["id"],))
+            indicator["levels"] = cursor.fetchall()
+        outcome["indicators"] = indicators
+        return outcome
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar resumen: {str(e)}")
+    finally:
+        close_db_connection(conn, cursor)
+
+@app.get("/api/outcome-summary/{outcome_id}", dependencies=[Depends(verify_api_key), conditional_get(catalog_only=True, max_age=CATALOG_MAX_AGE)])
+async def get_outcome_summary(outcome_id: int, request: Request):
+    return encoded_response(request, await cached_catalog(catalog_caches["outcome_summary"], outcome_id, load_outcome_summary, outcome_id))
+
+def load_outcome_assessment(outcome_id, scope=None):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection(replica=True)
+        cursor = conn.cursor(dictionary=True)
+        
+        # Verificar que el outcome existe
+        cursor.execute("SELECT id, so_number FROM mdl_gradingform_utb_outcomes WHERE id = %s", (outcome_id,))
+        outcome = cursor.fetchone()
         if not outcome:
             raise HTTPException(status_code=404, detail=f"Outcome con ID {outcome_id} no encontrado")
         
         # Obtener indicadores del outcome
-        cursor.execute("""
-            SELECT id, indicator_letter 
-            FROM mdl_gradingform_utb_indicators 
-            WHERE student_outcome_id = %s 
-            ORDER BY indicator_letter
-        """, (outcome_id,))
-        indicators = cursor.fetchall()
+        indicators = fetch_outcome_indicators(cursor, outcome_id)
         
-        if not indicators:
-            return {
-                "outcome_id": outcome_id,
-                "so_number": outcome["so_number"],
-                "indicators": [],
-                "summary": {}
-            }
-        
-        # Para cada indicador, obtener estadísticas por nivel
-        indicator_stats = []
-        
-        for indicator in indicators:
-            indicator_id = indicator["id"]
-            indicator_letter = indicator["indicator_letter"]
-            
-            # Obtener mapeo de performance_level_id a título (E, G, F, I)
-            cursor.execute("""
-                SELECT id, title_en, sortorder
-                FROM mdl_gradingform_utb_lvl 
-                WHERE indicator_id = %s
-                ORDER BY sortorder DESC
-            """, (indicator_id,))
-            levels = cursor.fetchall()
-            
-            # Crear mapeo de ID a letra de nivel
-            level_map = {}
-            for level in levels:
-                title = level["title_en"].upper()
-                # Mapear títulos a letras E, G, F, I
-                if "EXCELLENT" in title or "EXCELENTE" in title:
-                    level_map[level["id"]] = "E"
-                elif "GOOD" in title or "BUENO" in title:
-                    level_map[level["id"]] = "G"
-                elif "FAIR" in title or "REGULAR" in title:
-                    level_map[level["id"]] = "F"
-                elif "INADEQUATE" in title or "INADECUADO" in title:
-                    level_map[level["id"]] = "I"
-                else:
-                    # Si no coincide, usar primera letra del título
-                    level_map[level["id"]] = title[0] if title else "U"
-            
-            # Obtener conteo de evaluaciones por nivel para este indicador
-            cursor.execute("""
-                SELECT performance_level_id, COUNT(*) as count
-                FROM mdl_gradingform_utb_evaluations
-                WHERE indicator_id = %s
-                GROUP BY performance_level_id
-            """, (indicator_id,))
-            level_counts = cursor.fetchall()
-            
-            # Calcular total de evaluaciones
-            total = sum(row["count"] for row in level_counts)
-            
-            # Organizar estadísticas por nivel (E, G, F, I)
-            stats = {
-                "E": {"count": 0, "percentage": 0},
-                "G": {"count": 0, "percentage": 0},
-                "F": {"count": 0, "percentage": 0},
-                "I": {"count": 0, "percentage": 0}
-            }
-            
-            for row in level_counts:
-                level_id = row["performance_level_id"]
-                count = row["count"]
-                level_letter = level_map.get(level_id, "U")
-                
-                if level_letter in stats:
-                    stats[level_letter]["count"] = count
-                    if total > 0:
-                        stats[level_letter]["percentage"] = round((count / total) * 100)
-            
-            # Calcular E+G y F+I
-            eg_count = stats["E"]["count"] + stats["G"]["count"]
-            fi_count = stats["F"]["count"] + stats["I"]["count"]
-            eg_percentage = round((eg_count / total) * 100) if total > 0 else 0
-            fi_percentage = round((fi_count / total) * 100) if total > 0 else 0
-            
-            indicator_stats.append({
-                "indicator": indicator_letter,
-                "indicator_id": indicator_id,
-                "total_evaluations": total,
-                "levels": stats,
-                "summary": {
-                    "E_plus_G": {"count": eg_count, "percentage": eg_percentage},
-                    "F_plus_I": {"count": fi_count, "percentage": fi_percentage}
-                }
-            })
-        
-        return {
-            "outcome_id": outcome_id,
-            "so_number": outcome["so_number"],
-            "indicators": indicator_stats
-        }
+        # Niveles y conteos de todos los indicadores en consultas agrupadas por indicator_id
+        indicator_ids = [indicator["id"] for indicator in indicators]
+        level_maps = level_index.maps_for(cursor, indicator_ids)
+        level_counts = outcome_level_counts(cursor, indicator_ids, scope)
+        return build_assessment_payload(outcome_id, outcome["so_number"], indicators, level_maps, level_counts)
         
     except HTTPException:
         raise
     except Error as e:
-        raise HTTPException(status_code=500, detail=f"Error al calcular estadísticas: {str(e)}")
+        raise query_error(e, "Error al calcular estadísticas")
     finally:
         close_db_connection(conn, cursor)
 
-@app.get("/api/outcome-chart/{outcome_id}", dependencies=[Depends(verify_api_key)])
-def get_outcome_chart(outcome_id: int):
+@app.get("/api/outcome-assessment/{outcome_id}", dependencies=[Depends(verify_api_key), conditional_get(), admission_control("assessment")])
+async def get_outcome_assessment(outcome_id: int, request: Request, scope: Optional[dict] = Depends(evaluation_scope)):
     """
-    Obtener datos para gráfico de barras: porcentaje de estudiantes que alcanzaron
-    nivel E+G por cada indicador de performance.
+    Obtener estadísticas de evaluación directa por nivel de desempeño (E, G, F, I)
+    para cada indicador de performance de un outcome específico.
+
+    Filtros opcionales: `courseid`, `from`/`to` (timecreated) y `program`.
     """
+    payload = await payload_cache.get_or_build(request, payload_key("assessment", outcome_id, scope), load_outcome_assessment, outcome_id, scope)
+    return encoded_response(request, payload)
+
+def load_outcome_chart(outcome_id, scope=None):
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(replica=True)
         cursor = conn.cursor(dictionary=True)
         
         # Verificar que el outcome existe
@@ -431,106 +3009,118 @@ def get_outcome_chart(outcome_id: int):
             raise HTTPException(status_code=404, detail=f"Outcome con ID {outcome_id} no encontrado")
         
         # Obtener indicadores del outcome
-        cursor.execute("""
-            SELECT id, indicator_letter 
-            FROM mdl_gradingform_utb_indicators 
-            WHERE student_outcome_id = %s 
-            ORDER BY indicator_letter
-        """, (outcome_id,))
-        indicators = cursor.fetchall()
-        
-        if not indicators:
-            return {
-                "outcome_id": outcome_id,
-                "so_number": outcome["so_number"],
-                "chart_data": []
-            }
-        
-        # Para cada indicador, calcular porcentaje de E+G
-        chart_data = []
-        
-        for indicator in indicators:
-            indicator_id = indicator["id"]
-            indicator_letter = indicator["indicator_letter"]
-            
-            # Obtener mapeo de performance_level_id a nivel (E, G, F, I)
-            cursor.execute("""
-                SELECT id, title_en, sortorder
-                FROM mdl_gradingform_utb_lvl 
-                WHERE indicator_id = %s
-                ORDER BY sortorder DESC
-            """, (indicator_id,))
-            levels = cursor.fetchall()
-            
-            # Crear mapeo de ID a letra de nivel
-            level_map = {}
-            for level in levels:
-                title = level["title_en"].upper()
-                if "EXCELLENT" in title or "EXCELENTE" in title:
-                    level_map[level["id"]] = "E"
-                elif "GOOD" in title or "BUENO" in title:
-                    level_map[level["id"]] = "G"
-                elif "FAIR" in title or "REGULAR" in title:
-                    level_map[level["id"]] = "F"
-                elif "INADEQUATE" in title or "INADECUADO" in title:
-                    level_map[level["id"]] = "I"
-                else:
-                    level_map[level["id"]] = title[0] if title else "U"
-            
-            # Obtener conteo de evaluaciones por nivel
-            cursor.execute("""
-                SELECT performance_level_id, COUNT(*) as count
-                FROM mdl_gradingform_utb_evaluations
-                WHERE indicator_id = %s
-                GROUP BY performance_level_id
-            """, (indicator_id,))
-            level_counts = cursor.fetchall()
-            
-            # Calcular total
-            total = sum(row["count"] for row in level_counts)
-            
-            # Contar E y G
-            e_count = 0
-            g_count = 0
-            
-            for row in level_counts:
-                level_id = row["performance_level_id"]
-                count = row["count"]
-                level_letter = level_map.get(level_id, "U")
-                
-                if level_letter == "E":
-                    e_count += count
-                elif level_letter == "G":
-                    g_count += count
-            
-            # Calcular porcentaje E+G
-            eg_count = e_count + g_count
-            eg_percentage = round((eg_count / total) * 100) if total > 0 else 0
-            
-            chart_data.append({
-                "indicator": indicator_letter,
-                "indicator_id": indicator_id,
-                "percentage_eg": eg_percentage,
-                "count_eg": eg_count,
-                "total": total
-            })
+        indicators = fetch_outcome_indicators(cursor, outcome_id)
         
-        return {
-            "outcome_id": outcome_id,
-            "so_number": outcome["so_number"],
-            "title": f"Percentage of student relates can attained E+G Level",
-            "chart_data": chart_data
-        }
+        # Niveles y conteos de todos los indicadores en consultas agrupadas por indicator_id
+        indicator_ids = [indicator["id"] for indicator in indicators]
+        level_maps = level_index.maps_for(cursor, indicator_ids)
+        level_counts = outcome_level_counts(cursor, indicator_ids, scope)
+        return build_chart_payload(outcome_id, outcome["so_number"], indicators, level_maps, level_counts)
         
     except HTTPException:
         raise
     except Error as e:
-        raise HTTPException(status_code=500, detail=f"Error al generar datos del gráfico: {str(e)}")
+        raise query_error(e, "Error al generar datos del gráfico")
+    finally:
+        close_db_connection(conn, cursor)
+
+@app.get("/api/outcome-chart/{outcome_id}", dependencies=[Depends(verify_api_key), conditional_get(), admission_control("chart")])
+async def get_outcome_chart(outcome_id: int, request: Request, scope: Optional[dict] = Depends(evaluation_scope)):
+    """
+    Obtener datos para gráfico de barras: porcentaje de estudiantes que alcanzaron
+    nivel E+G por cada indicador de performance.
+
+    Filtros opcionales: `courseid`, `from`/`to` (timecreated) y `program`.
+    """
+    payload = await payload_cache.get_or_build(request, payload_key("chart", outcome_id, scope), load_outcome_chart, outcome_id, scope)
+    return encoded_response(request, payload)
+
+# Partes del reporte
+# Cada función recibe `(cursor, outcome_id, scope)`; `load_outcome_report` las reparte según
+# REPORT_FANOUT_CONCURRENCY (ver "Reporte en paralelo").
+
+def fetch_report_indicators(cursor, outcome_id, scope=None):
+    """Outcome, estado de sus indicadores, total de estudiantes y cumplimiento"""
+    cursor.execute("""
+        SELECT id, so_number, description_en, description_es
+        FROM mdl_gradingform_utb_outcomes
+        WHERE id = %s
+    """, (outcome_id,))
+    outcome = cursor.fetchone()
+
+    if not outcome:
+        raise HTTPException(status_code=404, detail="Outcome no encontrado")
+
+    # Indicadores del outcome con sus niveles y conteos (consultas agrupadas por indicator_id)
+    indicators = fetch_outcome_indicators(cursor, outcome_id)
+    indicator_ids = [indicator["id"] for indicator in indicators]
+    level_maps = level_index.maps_for(cursor, indicator_ids)
+    level_counts = outcome_level_counts(cursor, indicator_ids, scope)
+
+    indicators_status, total_students = build_indicators_status(indicators, level_maps, level_counts)
+    return outcome, indicators_status, total_students, build_compliance(indicators_status)
+
+REPORT_PARTS = (fetch_report_indicators, fetch_outcome_courses, fetch_graded_students)
+
+def load_report_parts(fetches, outcome_id, scope):
+    """Ejecutar cada `fetch(cursor, outcome_id, scope)` en una misma conexión"""
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection(replica=True)
+        cursor = conn.cursor(dictionary=True)
+        return [fetch(cursor, outcome_id, scope) for fetch in fetches]
+    except HTTPException:
+        raise
+    except Error as e:
+        raise query_error(e, "Error al generar reporte")
     finally:
         close_db_connection(conn, cursor)
 
-@app.get("/api/outcome-report/{outcome_id:path}")
-async def get_outcome_report(outcome_id: str, api_key: str = Depends(verify_api_key)):
+async def load_outcome_report(outcome_id, scope=None):
+    # Limpiar el outcome_id (remover llaves si las tiene)
+    outcome_id = outcome_id.strip('{}').strip()
+    if replica_router.replicas:
+        # Con réplicas, una sola conexión por reporte: las tres partes salen de la misma réplica,
+        # cuya versión de datos se comprueba al obtener la conexión
+        parts = run_db(load_report_parts, REPORT_PARTS, outcome_id, scope)
+    else:
+        semaphore = asyncio.Semaphore(report_fanout)
+
+        async def part(fetch):
+            async with semaphore:
+                [result] = await run_db(load_report_parts, (fetch,), outcome_id, scope)
+                return result
+
+        parts = asyncio.gather(*(part(fetch) for fetch in REPORT_PARTS))
+    try:
+        results = await asyncio.wait_for(parts, REPORT_TIMEOUT if REPORT_TIMEOUT > 0 else None)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tiempo agotado al generar el reporte")
+    (outcome, indicators_status, total_students, compliance), (courses, professors_set), (graded_students, programs) = results
+
+    return {
+        "outcome_id": outcome_id,
+        "so_number": outcome["so_number"],
+        "description": outcome["description_en"],
+        "courses": courses,
+        "professors": list(professors_set),
+        "programs": programs,
+        "students": {
+            "total": total_students,
+            "type_of_assessment": "Continuous Assessment",
+            "graded_students": graded_students
+        },
+        "compliance": compliance,
+        "indicators": indicators_status,
+        "continuous_improvement": {
+            "activities_applied": "Ok",
+            "current_results": "Ok",
+            "actions_proposed": "Ok"
+        }
+    }
+
+@app.get("/api/outcome-report/{outcome_id:path}", dependencies=[Depends(verify_api_key), conditional_get(), admission_control("report")])
+async def get_outcome_report(outcome_id: str, request: Request, scope: Optional[dict] = Depends(evaluation_scope)):
     """
     Obtiene el reporte completo del Student Outcome incluyendo:
     - Información del curso y profesor
@@ -538,230 +3128,802 @@ async def get_outcome_report(outcome_id: str, api_key: str = Depends(verify_api_
     - Estado de los indicadores (Assessment y Students)
     - Resultados de mejora continua
     - Total de estudiantes
+
+    Filtros opcionales: `courseid`, `from`/`to` (timecreated) y `program`.
     """
+    key = payload_key("report", outcome_id.strip('{}').strip(), scope)
+    return encoded_response(request, await payload_cache.get_or_build(request, key, load_outcome_report, outcome_id, scope))
+
+# Estadísticas de varios outcomes
+def fetch_outcomes_level_counts(cursor, outcome_ids):
+    """Conteos por nivel de todos los indicadores de varios outcomes en una sola agregación"""
+    where = f"WHERE i.student_outcome_id IN ({_in_placeholders(outcome_ids)})" if outcome_ids is not None else ""
+    cursor.execute(f"""
+        SELECT {STATEMENT_TIMEOUT_HINT}e.indicator_id, e.performance_level_id, COUNT(*) as count
+        FROM mdl_gradingform_utb_evaluations e
+        JOIN mdl_gradingform_utb_indicators i ON i.id = e.indicator_id
+        {where}
+        GROUP BY e.indicator_id, e.performance_level_id
+    """, tuple(outcome_ids or ()))
+    level_counts = {}
+    for row in cursor.fetchall():
+        level_counts.setdefault(row["indicator_id"], []).append(row)
+    return level_counts
+
+def load_outcomes_batch(outcome_ids):
+    """Assessment y chart de varios outcomes (o de todos si `outcome_ids` es None)"""
     conn, cursor = None, None
-    
     try:
-        # Limpiar el outcome_id (remover llaves si las tiene)
-        outcome_id = outcome_id.strip('{}').strip()
-        
-        conn = get_db_connection()
+        conn = get_db_connection(replica=True)
         cursor = conn.cursor(dictionary=True)
-        
-        # 1. Obtener información del outcome
-        cursor.execute("""
-            SELECT id, so_number, description_en, description_es
-            FROM mdl_gradingform_utb_outcomes
-            WHERE id = %s
-        """, (outcome_id,))
-        outcome = cursor.fetchone()
-        
-        if not outcome:
-            raise HTTPException(status_code=404, detail="Outcome no encontrado")
-        
-        # 2. Obtener indicadores del outcome
-        cursor.execute("""
-            SELECT id, indicator_letter, description_en AS description
-            FROM mdl_gradingform_utb_indicators
-            WHERE student_outcome_id = %s
-            ORDER BY indicator_letter
-        """, (outcome_id,))
-        indicators = cursor.fetchall()
-        
-        # 3. Para cada indicador, obtener niveles de desempeño
-        indicators_status = []
-        total_students = 0
-        
-        for indicator in indicators:
-            indicator_id = indicator["id"]
-            indicator_letter = indicator["indicator_letter"]
-            
-            # Obtener niveles
-            cursor.execute("""
-                SELECT id, title_en, title_es
-                FROM mdl_gradingform_utb_lvl
-                WHERE indicator_id = %s
-                ORDER BY id
-            """, (indicator_id,))
-            levels = cursor.fetchall()
-            
-            # Mapear niveles a E/G/F/I
-            level_map = {}
-            for level in levels:
-                title = level["title_en"].upper()
-                if "EXCELLENT" in title or "EXCELENTE" in title:
-                    level_map[level["id"]] = "E"
-                elif "GOOD" in title or "BUENO" in title:
-                    level_map[level["id"]] = "G"
-                elif "FAIR" in title or "REGULAR" in title:
-                    level_map[level["id"]] = "F"
-                elif "INADEQUATE" in title or "INADECUADO" in title:
-                    level_map[level["id"]] = "I"
-                else:
-                    level_map[level["id"]] = title[0] if title else "U"
-            
-            # Obtener evaluaciones del indicador
-            cursor.execute("""
-                SELECT performance_level_id, COUNT(*) as count
-                FROM mdl_gradingform_utb_evaluations
-                WHERE indicator_id = %s
-                GROUP BY performance_level_id
-            """, (indicator_id,))
-            level_counts = cursor.fetchall()
-            
-            # Calcular total de evaluaciones
-            total_evaluations = sum(row["count"] for row in level_counts)
-            if total_evaluations > total_students:
-                total_students = total_evaluations
-            
-            # Contar por nivel
-            e_count = g_count = f_count = i_count = 0
-            for row in level_counts:
-                level_id = row["performance_level_id"]
-                count = row["count"]
-                level_letter = level_map.get(level_id, "U")
-                
-                if level_letter == "E":
-                    e_count += count
-                elif level_letter == "G":
-                    g_count += count
-                elif level_letter == "F":
-                    f_count += count
-                elif level_letter == "I":
-                    i_count += count
-            
-            # Determinar estado: Ok si tiene evaluaciones, Pendiente si no
-            assessment_status = "Ok" if total_evaluations > 0 else "Pendiente"
-            student_status = "Pendiente" if (f_count + i_count) > 0 else "Ok"
-            
-            indicators_status.append({
-                "indicator": indicator_letter,
-                "indicator_id": indicator_id,
-                "description": indicator["description"],
-                "assessment_status": assessment_status,
-                "student_status": student_status,
-                "evaluations": {
-                    "E": e_count,
-                    "G": g_count,
-                    "F": f_count,
-                    "I": i_count,
-                    "total": total_evaluations
-                }
+
+        if outcome_ids is None:
+            cursor.execute("SELECT id, so_number FROM mdl_gradingform_utb_outcomes ORDER BY id")
+        else:
+            cursor.execute(f"""
+                SELECT id, so_number FROM mdl_gradingform_utb_outcomes
+                WHERE id IN ({_in_placeholders(outcome_ids)})
+            """, tuple(outcome_ids))
+        found = {outcome["id"]: outcome for outcome in cursor.fetchall()}
+        ordered_ids = list(found) if outcome_ids is None else [oid for oid in outcome_ids if oid in found]
+
+        indicators_by_outcome = {outcome_id: [] for outcome_id in ordered_ids}
+        if ordered_ids:
+            cursor.execute(f"""
+                SELECT id, student_outcome_id, indicator_letter, description_en AS description
+                FROM mdl_gradingform_utb_indicators
+                WHERE student_outcome_id IN ({_in_placeholders(ordered_ids)})
+                ORDER BY indicator_letter
+            """, tuple(ordered_ids))
+            for indicator in cursor.fetchall():
+                indicators_by_outcome[indicator["student_outcome_id"]].append(indicator)
+        indicator_ids = [i["id"] for indicators in indicators_by_outcome.values() for i in indicators]
+
+        level_maps = level_index.maps_for(cursor, indicator_ids)
+        if STATS_STORE_ENABLED and cursor.replica is None:
+            level_counts = stats_store.level_counts(cursor, indicator_ids)
+        else:
+            grouped = fetch_outcomes_level_counts(cursor, ordered_ids if outcome_ids is not None else None) if ordered_ids else {}
+            level_counts = {indicator_id: grouped.get(indicator_id, []) for indicator_id in indicator_ids}
+
+        outcomes = []
+        for outcome_id in ordered_ids:
+            so_number = found[outcome_id]["so_number"]
+            indicators = indicators_by_outcome[outcome_id]
+            outcomes.append({
+                "outcome_id": outcome_id,
+                "so_number": so_number,
+                "assessment": build_assessment_payload(outcome_id, so_number, indicators, level_maps, level_counts),
+                "chart": build_chart_payload(outcome_id, so_number, indicators, level_maps, level_counts)
             })
-        
-        # 4. Calcular porcentajes de cumplimiento
-        # Compliance = (E + G) / Total
-        total_eg = sum(ind["evaluations"]["E"] + ind["evaluations"]["G"] for ind in indicators_status)
-        total_all = sum(ind["evaluations"]["total"] for ind in indicators_status)
-        
-        compliance_percentage = round((total_eg / total_all) * 100) if total_all > 0 else 0
-        missing_percentage = 100 - compliance_percentage
-        
-        # 5. Información del/los curso(s) y profesores relacionados con este outcome
-        # Obtener los courseids que tienen evaluaciones para este outcome
-        cursor.execute("""
-            SELECT DISTINCT e.courseid
-            FROM mdl_gradingform_utb_evaluations e
-            JOIN mdl_gradingform_utb_indicators i ON e.indicator_id = i.id
-            WHERE i.student_outcome_id = %s
-        """, (outcome_id,))
-        course_rows = cursor.fetchall()
-        courses = []
-        professors_set = set()
-
-        for crow in course_rows:
-            courseid = crow["courseid"]
-            # Obtener nombre del curso
-            cursor.execute("SELECT id, fullname FROM mdl_course WHERE id = %s", (courseid,))
-            course = cursor.fetchone()
-            course_name = course["fullname"] if course else f"course_{courseid}"
-
-            # Obtener profesores asignados al curso (buscar roles cuyo shortname contenga 'teacher')
+
+        missing = [] if outcome_ids is None else [oid for oid in outcome_ids if oid not in found]
+        return {"outcomes": outcomes, "not_found": missing}
+    except Error as e:
+        raise query_error(e, "Error al calcular estadísticas")
+    finally:
+        close_db_connection(conn, cursor)
+
+def parse_outcome_ids(raw_ids):
+    """`"all"` -> None; `"1,2,3"` -> [1, 2, 3] (sin duplicados, en el orden recibido)"""
+    if raw_ids.strip().lower() == "all":
+        return None
+    outcome_ids = []
+    for part in raw_ids.split(","):
+        if part.strip():
+            outcome_id = parse_path_id(part)
+            if outcome_id not in outcome_ids:
+                outcome_ids.append(outcome_id)
+    if not outcome_ids:
+        raise HTTPException(status_code=422, detail="Debe indicar al menos un outcome o 'all'")
+    return outcome_ids
+
+@app.get("/api/outcomes-batch", dependencies=[Depends(verify_api_key), conditional_get(), admission_control("batch")])
+async def get_outcomes_batch(request: Request, ids: str = Query("all", description="Ids separados por coma o 'all'")):
+    """
+    Obtener en una sola petición las estadísticas (assessment) y los datos del gráfico (chart)
+    de varios Student Outcomes, con el mismo formato que los endpoints individuales.
+    """
+    return encoded_response(request, await run_db(load_outcomes_batch, parse_outcome_ids(ids)))
+
+# Exportación en bloque
+def load_export(since):
+    """Árbol outcomes -> indicadores -> niveles con sus conteos, en un número fijo de consultas.
+
+    Con `since` sólo se incluyen los outcomes con evaluaciones modificadas desde esa marca, inclusive:
+    `timemodified` tiene resolución de segundos y lo escrito en el mismo segundo que la exportación
+    anterior se vuelve a enviar (APEX hace upsert, los repetidos no importan) en lugar de perderse.
+    """
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection(replica=True)
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute("SELECT MAX(timemodified) AS last_modified FROM mdl_gradingform_utb_evaluations")
+        last_modified = cursor.fetchone()["last_modified"] or 0
+
+        if since is None:
             cursor.execute("""
-                SELECT DISTINCT u.id, u.firstname, u.lastname
-                FROM mdl_user u
-                JOIN mdl_role_assignments ra ON ra.userid = u.id
-                JOIN mdl_context c ON c.id = ra.contextid
-                JOIN mdl_role r ON r.id = ra.roleid
-                WHERE c.contextlevel = 50 AND c.instanceid = %s AND r.shortname LIKE %s
-            """, (courseid, "%teacher%"))
-            prof_rows = cursor.fetchall()
-            profs = []
-            for p in prof_rows:
-                name = f"{p['firstname']} {p['lastname']}"
-                profs.append({"id": p["id"], "name": name})
-                professors_set.add(name)
-
-            courses.append({"id": courseid, "name": course_name, "professors": profs})
-
-        # 6. Lista de estudiantes calificados para este outcome (nombres y programa)
-        cursor.execute("""
-            SELECT DISTINCT u.id, u.firstname, u.lastname, u.idnumber, u.department
-            FROM mdl_user u
-            JOIN mdl_gradingform_utb_evaluations e ON e.studentid = u.id
-            JOIN mdl_gradingform_utb_indicators i ON e.indicator_id = i.id
-            WHERE i.student_outcome_id = %s
-        """, (outcome_id,))
-        student_rows = cursor.fetchall()
-
-        # Intentar resolver el campo personalizado que contiene el programa del estudiante
-        cursor.execute("SELECT id FROM mdl_user_info_field WHERE shortname LIKE %s OR name LIKE %s OR name LIKE %s", ("%program%", "%program%", "%programa%"))
-        field_rows = cursor.fetchall()
-        program_field_ids = [r['id'] for r in field_rows] if field_rows else []
-
-        graded_students = []
-        for s in student_rows:
-            program = None
-            if program_field_ids:
-                placeholders = ','.join(['%s'] * len(program_field_ids))
-                params = [s['id']] + program_field_ids
-                cursor.execute(f"SELECT data FROM mdl_user_info_data WHERE userid = %s AND fieldid IN ({placeholders})", tuple(params))
-                pdata = cursor.fetchone()
-                if pdata and pdata.get('data'):
-                    program = pdata.get('data')
-
-            # Fallbacks si no se encontró programa en campos personalizados
-            if not program:
-                # Usar department o idnumber si están presentes
-                program = s.get('department') or s.get('idnumber') or None
-
-            graded_students.append({
-                "id": s['id'],
-                "name": f"{s['firstname']} {s['lastname']}",
-                "program": program
+                SELECT id, so_number, description_en, description_es
+                FROM mdl_gradingform_utb_outcomes
+                ORDER BY id
+            """)
+        else:
+            cursor.execute(f"""
+                SELECT {STATEMENT_TIMEOUT_HINT}id, so_number, description_en, description_es
+                FROM mdl_gradingform_utb_outcomes
+                WHERE id IN (
+                    SELECT DISTINCT i.student_outcome_id
+                    FROM mdl_gradingform_utb_evaluations e
+                    JOIN mdl_gradingform_utb_indicators i ON e.indicator_id = i.id
+                    WHERE e.timemodified >= %s
+                )
+                ORDER BY id
+            """, (since,))
+        outcomes = cursor.fetchall()
+        outcome_ids = [outcome["id"] for outcome in outcomes]
+
+        indicators = []
+        if outcome_ids:
+            cursor.execute(f"""
+                SELECT id, student_outcome_id, indicator_letter, description_en, description_es
+                FROM mdl_gradingform_utb_indicators
+                WHERE student_outcome_id IN ({_in_placeholders(outcome_ids)})
+                ORDER BY student_outcome_id, indicator_letter
+            """, tuple(outcome_ids))
+            indicators = cursor.fetchall()
+        indicator_ids = [indicator["id"] for indicator in indicators]
+
+        levels_by_indicator = {}
+        if indicator_ids:
+            cursor.execute(f"""
+                SELECT id, indicator_id, title_en, title_es, description_es AS description,
+                       minscore, maxscore, sortorder
+                FROM mdl_gradingform_utb_lvl
+                WHERE indicator_id IN ({_in_placeholders(indicator_ids)})
+                ORDER BY indicator_id, sortorder DESC
+            """, tuple(indicator_ids))
+            for level in cursor.fetchall():
+                levels_by_indicator.setdefault(level.pop("indicator_id"), []).append(level)
+
+        level_maps = level_index.maps_for(cursor, indicator_ids)
+        level_counts = outcome_level_counts(cursor, indicator_ids)
+
+        indicators_by_outcome = {}
+        for indicator in indicators:
+            indicator["description"] = indicator["description_en"]
+            indicators_by_outcome.setdefault(indicator["student_outcome_id"], []).append(indicator)
+
+        exported = []
+        for outcome in outcomes:
+            outcome_indicators = indicators_by_outcome.get(outcome["id"], [])
+            # Mismo formato que /api/outcome-report para reutilizar la sincronización existente
+            indicators_status, total_students = build_indicators_status(outcome_indicators, level_maps, level_counts)
+            for status, indicator in zip(indicators_status, outcome_indicators):
+                status["description_es"] = indicator["description_es"]
+                status["levels"] = levels_by_indicator.get(indicator["id"], [])
+            exported.append({
+                "outcome_id": outcome["id"],
+                "so_number": outcome["so_number"],
+                "description": outcome["description_en"],
+                "description_es": outcome["description_es"],
+                "students": {"total": total_students},
+                "compliance": build_compliance(indicators_status),
+                "indicators": indicators_status
             })
 
         return {
+            "last_modified": last_modified,
+            "since": since,
+            "outcomes": exported
+        }
+    except Error as e:
+        raise query_error(e, "Error al generar exportación")
+    finally:
+        close_db_connection(conn, cursor)
+
+EXPORT_COLUMNS = [
+    "outcome_id", "so_number", "indicator_id", "indicator", "description",
+    "assessment_status", "student_status", "E", "G", "F", "I", "total",
+]
+
+def export_table(payload):
+    """Una fila por indicador exportado, alineada con EXPORT_COLUMNS"""
+    table = []
+    for outcome in payload["outcomes"]:
+        for indicator in outcome["indicators"]:
+            evaluations = indicator["evaluations"]
+            table.append([
+                outcome["outcome_id"], outcome["so_number"], indicator["indicator_id"], indicator["indicator"],
+                indicator["description"], indicator["assessment_status"], indicator["student_status"],
+                evaluations["E"], evaluations["G"], evaluations["F"], evaluations["I"], evaluations["total"],
+            ])
+    return table
+
+def load_evaluations_last_modified():
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT MAX(timemodified) AS last_modified FROM mdl_gradingform_utb_evaluations")
+        return cursor.fetchone()["last_modified"] or 0
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar última modificación: {str(e)}")
+    finally:
+        close_db_connection(conn, cursor)
+
+@app.get("/api/export", dependencies=[Depends(verify_api_key), conditional_get(), admission_control("export")])
+async def get_export(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    response_format: Optional[str] = Query(None, alias="format", pattern="^(json|msgpack|csv|columns)$"),
+):
+    """
+    Exportar en una sola respuesta todos los outcomes con sus indicadores, niveles y
+    conteos E/G/F/I (para la sincronización de APEX).
+
+    - `since` (timestamp Unix) o la cabecera `If-Modified-Since`: devolver sólo los outcomes
+      con evaluaciones modificadas desde esa fecha (inclusive). `last_modified` en la respuesta es
+      el valor a usar como `since` en la siguiente sincronización. Sólo refleja evaluaciones: los
+      cambios del catálogo llegan con una exportación completa.
+    - `format=msgpack|csv|columns` (o la cabecera `Accept`): MessagePack, o una fila por indicador
+      con sus conteos en CSV / JSON por columnas (sin los niveles).
+    """
+    response_format = negotiate_format(request, TABULAR_FORMATS, response_format)
+    if since is None and "if-modified-since" in request.headers:
+        try:
+            modified_since = int(parsedate_to_datetime(request.headers["if-modified-since"]).timestamp())
+        except (TypeError, ValueError):
+            modified_since = None
+        if modified_since is not None:
+            last_modified = await run_db(load_evaluations_last_modified)
+            # En el mismo segundo pudo escribirse algo después de la exportación anterior: sólo
+            # se responde 304 si la última modificación es estrictamente anterior
+            if last_modified < modified_since:
+                return Response(status_code=304, headers={"Last-Modified": formatdate(last_modified, usegmt=True)})
+            since = modified_since
+
+    payload = await run_db(load_export, since)
+    headers = {"Last-Modified": formatdate(payload["last_modified"], usegmt=True)}
+    if response_format in ("csv", "columns"):
+        return tabular_response(response_format, EXPORT_COLUMNS, export_table(payload), headers)
+    if response_format == "msgpack":
+        return msgpack_response(payload, headers)
+    response_class = FastJSONResponse if FAST_JSON_RESPONSES else JSONResponse
+    return response_class(payload, headers=headers)
+
+# Estadísticas en vivo (Server-Sent Events)
+# /api/outcome-stream mantiene abierta una conexión por dashboard y le envía los conteos E/G/F/I
+# y el porcentaje E+G de los outcomes suscritos cada vez que cambian. Una sola tarea por proceso
+# consulta cada STREAM_CHECK_INTERVAL segundos MAX(timemodified)/MAX(id) de las evaluaciones
+# (una consulta, haya uno o cien clientes) y, si hubo cambios, recalcula una vez los outcomes
+# afectados que alguien sigue (agregando en la BD sólo sus indicadores) y reparte el resultado
+# a todos sus suscriptores. Sin suscriptores
+# no se consulta la BD. Un cliente lento sólo recibe la última versión de cada outcome.
+# La última versión publicada de cada outcome vigilado se guarda: un cliente nuevo (o que se
+# reconecta) la recibe como estado inicial, y sólo los outcomes que nadie seguía se calculan,
+# todos juntos en consultas agrupadas.
+STREAM_CHECK_INTERVAL = float(os.getenv("STREAM_CHECK_INTERVAL", 5))
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", 15))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", 500))
+STREAM_RETRY_MS = int(os.getenv("STREAM_RETRY_MS", 5000))
+
+def fetch_changed_outcomes(cursor, watermark):
+    """Outcomes con evaluaciones nuevas o modificadas desde `watermark`"""
+    timemodified, max_id = watermark
+    cursor.execute("""
+        SELECT DISTINCT i.student_outcome_id
+        FROM mdl_gradingform_utb_indicators i
+        WHERE i.id IN (
+            SELECT indicator_id FROM mdl_gradingform_utb_evaluations WHERE timemodified >= %s
+            UNION
+            SELECT indicator_id FROM mdl_gradingform_utb_evaluations WHERE id > %s
+        )
+    """, (timemodified, max_id))
+    return {row["student_outcome_id"] for row in cursor.fetchall()}
+
+def fetch_outcomes_live_stats(cursor, outcome_ids):
+    """Conteos E/G/F/I y porcentaje E+G por indicador de cada outcome, en consultas agrupadas.
+
+    Los outcomes que no existen no aparecen en el resultado.
+    """
+    if not outcome_ids:
+        return {}
+    outcome_ids = list(outcome_ids)
+    cursor.execute(f"""
+        SELECT id, so_number FROM mdl_gradingform_utb_outcomes
+        WHERE id IN ({_in_placeholders(outcome_ids)})
+        ORDER BY id
+    """, tuple(outcome_ids))
+    so_numbers = {row["id"]: row["so_number"] for row in cursor.fetchall()}
+    indicators_by_outcome = {outcome_id: [] for outcome_id in so_numbers}
+    if so_numbers:
+        cursor.execute(f"""
+            SELECT id, student_outcome_id, indicator_letter, description_en AS description
+            FROM mdl_gradingform_utb_indicators
+            WHERE student_outcome_id IN ({_in_placeholders(so_numbers)})
+            ORDER BY indicator_letter
+        """, tuple(so_numbers))
+        for row in cursor.fetchall():
+            indicators_by_outcome[row["student_outcome_id"]].append(row)
+    indicator_ids = [indicator["id"] for indicators in indicators_by_outcome.values() for indicator in indicators]
+    level_maps = level_index.maps_for(cursor, indicator_ids)
+    # Conteos leídos en la misma conexión que la marca de agua, sin pasar por las estadísticas
+    # materializadas: su refresco periódico podría ir por detrás de la marca ya leída
+    level_counts = fetch_level_counts(cursor, indicator_ids)
+    return {
+        outcome_id: {
             "outcome_id": outcome_id,
-            "so_number": outcome["so_number"],
-            "description": outcome["description_en"],
-            "courses": courses,
-            "professors": list(professors_set),
-            "programs": ["IAMB"],
-            "students": {
-                "total": total_students,
-                "type_of_assessment": "Continuous Assessment",
-                "graded_students": graded_students
-            },
-            "compliance": {
-                "percentage": compliance_percentage,
-                "missing_percentage": missing_percentage
-            },
-            "indicators": indicators_status,
-            "continuous_improvement": {
-                "activities_applied": "Ok",
-                "current_results": "Ok",
-                "actions_proposed": "Ok"
-            }
+            "so_number": so_numbers[outcome_id],
+            "indicators": [
+                {
+                    "indicator": stats["indicator"],
+                    "indicator_id": stats["indicator_id"],
+                    "total": stats["total_evaluations"],
+                    "counts": {letter: level["count"] for letter, level in stats["levels"].items()},
+                    "percentage_eg": stats["summary"]["E_plus_G"]["percentage"],
+                }
+                for stats in build_assessment_stats(indicators, level_maps, level_counts)
+            ],
         }
-        
+        for outcome_id, indicators in indicators_by_outcome.items()
+    }
+
+def load_live_stats(outcome_ids, known=()):
+    """Marca de agua actual, ids de `outcome_ids` (None = todos) y estadísticas de los que no están en `known`"""
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        # La marca se lee antes de calcular: un cambio posterior se detecta en la siguiente comprobación
+        watermark = fetch_evaluations_watermark(cursor)
+        if outcome_ids is None:
+            cursor.execute("SELECT id FROM mdl_gradingform_utb_outcomes ORDER BY id")
+            outcome_ids = [row["id"] for row in cursor.fetchall()]
+        missing = [outcome_id for outcome_id in outcome_ids if outcome_id not in known]
+        payloads = fetch_outcomes_live_stats(cursor, missing)
+        for outcome_id in missing:
+            if outcome_id not in payloads:
+                raise HTTPException(status_code=404, detail=f"Outcome con ID {outcome_id} no encontrado")
+        return watermark, outcome_ids, payloads
     except HTTPException:
         raise
     except Error as e:
-        raise HTTPException(status_code=500, detail=f"Error al generar reporte: {str(e)}")
+        raise query_error(e, "Error al calcular estadísticas")
+    finally:
+        close_db_connection(conn, cursor)
+
+def detect_outcome_changes(watermark, watched):
+    """Nueva marca de agua y estadísticas recalculadas de los outcomes vigilados que cambiaron.
+
+    `watched` es None si algún cliente sigue todos los outcomes.
+    """
+    conn, cursor = None, None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        current = fetch_evaluations_watermark(cursor)
+        if current == watermark:
+            return current, {}
+        changed = fetch_changed_outcomes(cursor, watermark)
+        if watched is not None:
+            changed &= watched
+        # Los conteos materializados se ponen al día con un refresco incremental
+        stats_store.mark_stale()
+        return current, fetch_outcomes_live_stats(cursor, changed)
     finally:
         close_db_connection(conn, cursor)
 
+def format_sse(event, payload):
+    data = dumps_json(payload).decode("utf-8")
+    return f"event: {event}\ndata: {data}\n\n"
+
+class StreamSubscriber:
+    """Un cliente conectado: outcomes que sigue y la última versión pendiente de enviar de cada uno."""
+
+    def __init__(self, outcome_ids):
+        self.outcome_ids = None if outcome_ids is None else set(outcome_ids)
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+
+    def wants(self, outcome_id):
+        return self.outcome_ids is None or outcome_id in self.outcome_ids
+
+class OutcomeStatsStream:
+    """Suscriptores de /api/outcome-stream y la tarea única que detecta cambios y los reparte."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._subscribers = set()
+        self.watermark = None
+        # Última versión publicada de cada outcome vigilado, al día con `watermark`
+        self.latest = {}
+        self._task = None
+        self._lock = asyncio.Lock()
+        self.checks = 0
+        self.changes = 0
+        self.events_published = 0
+        self.errors = 0
+
+    def subscribe(self, outcome_ids):
+        if len(self._subscribers) >= STREAM_MAX_SUBSCRIBERS:
+            raise HTTPException(
+                status_code=503,
+                detail="Demasiadas conexiones de estadísticas en vivo",
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+        subscriber = StreamSubscriber(outcome_ids)
+        self._subscribers.add(subscriber)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+        # Un outcome que nadie vigila deja de recalcularse: su última versión ya no es fiable
+        watched = self._watched()
+        if watched is not None:
+            for outcome_id in self.latest.keys() - watched:
+                del self.latest[outcome_id]
+
+    def _watched(self):
+        watched = set()
+        for subscriber in self._subscribers:
+            if subscriber.outcome_ids is None:
+                return None
+            watched |= subscriber.outcome_ids
+        return watched
+
+    async def initial_state(self, subscriber, outcome_ids):
+        """Estado actual para un cliente nuevo: la última versión publicada de cada outcome y, para
+        los que aún no tienen una, una sola carga agrupada. No se solapa con una comprobación: lo que
+        ésta haya dejado pendiente es anterior al estado enviado y se descarta"""
+        async with self._lock:
+            if outcome_ids is None or any(outcome_id not in self.latest for outcome_id in outcome_ids):
+                watermark, outcome_ids, payloads = await run_db(load_live_stats, outcome_ids, set(self.latest))
+                if self.watermark is None:
+                    self.watermark = watermark
+                self.latest.update(payloads)
+            subscriber.pending.clear()
+            subscriber.wakeup.clear()
+            return {outcome_id: self.latest[outcome_id] for outcome_id in outcome_ids}
+
+    def publish(self, payloads):
+        for subscriber in self._subscribers:
+            for outcome_id, payload in payloads.items():
+                if subscriber.wants(outcome_id):
+                    subscriber.pending[outcome_id] = payload
+                    subscriber.wakeup.set()
+                    self.events_published += 1
+
+    async def check(self):
+        async with self._lock:
+            if self.watermark is None:
+                # Ningún estado inicial se completó todavía: sólo se toma la referencia
+                self.watermark, _, _ = await run_db(load_live_stats, [])
+                return
+            watermark, payloads = await run_db(detect_outcome_changes, self.watermark, self._watched())
+            self.checks += 1
+            if watermark != self.watermark:
+                self.changes += 1
+            self.watermark = watermark
+            self.latest.update(payloads)
+            self.publish(payloads)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._subscribers:
+                continue
+            try:
+                await self.check()
+            except Exception as e:
+                self.errors += 1
+                logger.warning("No se pudieron comprobar cambios para las estadísticas en vivo: %s", getattr(e, "detail", e))
+
+    async def events(self, subscriber, initial):
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            for payload in initial.values():
+                yield format_sse("outcome-stats", payload)
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Comentario SSE para que proxies y balanceadores no cierren la conexión
+                    yield ": keepalive\n\n"
+                    continue
+                subscriber.wakeup.clear()
+                pending, subscriber.pending = subscriber.pending, {}
+                for payload in pending.values():
+                    yield format_sse("outcome-stats", payload)
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        watched = self._watched()
+        return {
+            "subscribers": len(self._subscribers),
+            "watched_outcomes": "all" if watched is None else sorted(watched),
+            "cached_outcomes": len(self.latest),
+            "check_interval_seconds": self.interval,
+            "checks": self.checks,
+            "changes_detected": self.changes,
+            "events_published": self.events_published,
+            "errors": self.errors,
+        }
+
+outcome_stream = OutcomeStatsStream(STREAM_CHECK_INTERVAL)
+
+@app.on_event("shutdown")
+async def stop_outcome_stream():
+    await outcome_stream.stop()
+
+@app.get("/api/outcome-stream", dependencies=[Depends(verify_api_key)])
+async def stream_outcome_stats(ids: str = Query("all", description="Ids separados por coma o 'all'")):
+    """
+    Server-Sent Events con los conteos E/G/F/I y el porcentaje E+G por indicador de los outcomes
+    indicados. Envía primero el estado actual de cada outcome y después un evento `outcome-stats`
+    cada vez que cambian sus evaluaciones.
+    """
+    outcome_ids = parse_outcome_ids(ids)
+    subscriber = outcome_stream.subscribe(outcome_ids)
+    try:
+        initial = await outcome_stream.initial_state(subscriber, outcome_ids)
+    except BaseException:
+        outcome_stream.unsubscribe(subscriber)
+        raise
+    return StreamingResponse(
+        outcome_stream.events(subscriber, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Precalentamiento de cachés
+# Al arrancar, una tarea de fondo carga el catálogo (outcomes, indicadores, niveles, resúmenes) y calcula
+# reportes, assessments y charts de todos los outcomes con a lo sumo WARMUP_CONCURRENCY a la
+# vez. Luego, cada WARMUP_REFRESH_INTERVAL segundos, recalcula sólo los payloads que algún
+# cliente pidió en los últimos WARMUP_HOT_WINDOW segundos y que ya no están vigentes (expirados,
+# desalojados o de una versión anterior): un cambio de datos no dispara el recálculo de todos
+# los outcomes. Cada cálculo ocupa un lugar del control de admisión de su ruta, sólo si hay uno
+# libre y nadie espera, y se limita a WARMUP_RATE cálculos por segundo. Con
+# WARMUP_REQUIRED_FOR_READY, /health/ready responde 503 hasta completar la primera pasada.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", 2))
+WARMUP_REFRESH_INTERVAL = float(os.getenv("WARMUP_REFRESH_INTERVAL", 30))
+WARMUP_HOT_WINDOW = float(os.getenv("WARMUP_HOT_WINDOW", 600))
+WARMUP_RATE = float(os.getenv("WARMUP_RATE", 2))
+WARMUP_REQUIRED_FOR_READY = os.getenv("WARMUP_REQUIRED_FOR_READY", "false").lower() in ("1", "true", "yes")
+
+class CacheWarmer:
+    """Pasadas de precalentamiento con paralelismo y ritmo acotados y progreso consultable."""
+
+    POLL_INTERVAL = 0.1
+    SLOT_WAIT = 30
+
+    def __init__(self, concurrency, interval, rate, hot_window):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.rate = rate
+        self.hot_window = hot_window
+        self.state = "pending"
+        self.warmed = False
+        self.passes = 0
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.last_error = None
+        self.last_duration = None
+        self.refreshed = 0
+        self.skipped_busy = 0
+        self._next_at = 0.0
+        self._task = None
+
+    async def _pace(self):
+        """Espaciar los cálculos para no superar `rate` por segundo"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        wait = self._next_at - now
+        self._next_at = max(now, self._next_at) + 1 / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _build(self, key, loader, args):
+        """Calcular un payload con un lugar libre de su ruta en el control de admisión"""
+        if await payload_cache.is_fresh(key):
+            return
+        await self._pace()
+        limiter = admission_limiters[key.split(":", 1)[0]]
+        deadline = time.monotonic() + self.SLOT_WAIT
+        while not await limiter.try_acquire():
+            if time.monotonic() >= deadline:
+                # La ruta sigue ocupada por clientes: se reintenta en la siguiente pasada
+                self.skipped_busy += 1
+                return
+            await asyncio.sleep(self.POLL_INTERVAL)
+        try:
+            await payload_cache.get_or_build(None, key, loader, *args)
+        finally:
+            limiter.release()
+
+    async def _job(self, semaphore, description, coroutine_factory):
+        async with semaphore:
+            try:
+                return await coroutine_factory()
+            except Exception as e:
+                self.failed += 1
+                self.last_error = f"{description}: {getattr(e, 'detail', e)}"
+                logger.warning("Precalentamiento de %s falló: %s", description, getattr(e, "detail", e))
+            finally:
+                self.done += 1
+
+    async def run_once(self):
+        self.state = "running"
+        self.total = self.done = self.failed = 0
+        start = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            outcomes = await cached_catalog(catalog_caches["outcomes"], "all", load_outcomes, None, None)
+        except Exception as e:
+            self.state = "failed"
+            self.last_error = f"outcomes: {getattr(e, 'detail', e)}"
+            logger.warning("Precalentamiento: no se pudo cargar el catálogo: %s", getattr(e, "detail", e))
+            return
+        outcome_ids = [outcome["id"] for outcome in outcomes]
+
+        # 1. Indicadores de cada outcome (necesarios para conocer los niveles a cargar)
+        self.total = len(outcome_ids)
+        indicator_lists = await asyncio.gather(*[
+            self._job(semaphore, f"indicadores de {outcome_id}",
+                      functools.partial(cached_catalog, catalog_caches["indicators"], outcome_id, load_indicators, outcome_id))
+            for outcome_id in outcome_ids
+        ])
+        indicator_ids = [indicator["id"] for indicators in indicator_lists if indicators for indicator in indicators]
+
+        # 2. Niveles de cada indicador y payloads de cada outcome
+        jobs = [
+            self._job(semaphore, f"niveles de {indicator_id}",
+                      functools.partial(cached_catalog, catalog_caches["levels"], indicator_id, load_levels, indicator_id))
+            for indicator_id in indicator_ids
+        ]
+        jobs += [
+            self._job(semaphore, f"resumen de {outcome_id}",
+                      functools.partial(cached_catalog, catalog_caches["outcome_summary"], outcome_id, load_outcome_summary, outcome_id))
+            for outcome_id in outcome_ids
+        ]
+        if payload_cache.backend is not None:
+            for outcome_id in outcome_ids:
+                for key, loader, args in (
+                    (payload_key("report", str(outcome_id), None), load_outcome_report, (str(outcome_id), None)),
+                    (payload_key("assessment", outcome_id, None), load_outcome_assessment, (outcome_id, None)),
+                    (payload_key("chart", outcome_id, None), load_outcome_chart, (outcome_id, None)),
+                ):
+                    jobs.append(self._job(semaphore, key, functools.partial(self._build, key, loader, args)))
+        self.total += len(jobs)
+        await asyncio.gather(*jobs)
+
+        self.passes += 1
+        self.warmed = True
+        self.state = "ready"
+        self.last_duration = time.monotonic() - start
+
+    async def refresh_hot(self):
+        """Recalcular los payloads pedidos recientemente que ya no están vigentes"""
+        if payload_cache.backend is None:
+            return
+        semaphore = asyncio.Semaphore(self.concurrency)
+        jobs = []
+        for key, loader, args in payload_cache.hot_entries(self.hot_window):
+            if not await payload_cache.is_fresh(key):
+                jobs.append(self._job(semaphore, key, functools.partial(self._build, key, loader, args)))
+        self.refreshed += len(jobs)
+        await asyncio.gather(*jobs)
+        self.passes += 1
+
+    async def _run(self):
+        await self.run_once()
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_hot()
+            except Exception as e:
+                self.last_error = f"refresco: {getattr(e, 'detail', e)}"
+                logger.warning("Refresco de payloads falló: %s", getattr(e, "detail", e))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "enabled": WARMUP_ENABLED,
+            "state": self.state,
+            "warmed": self.warmed,
+            "passes": self.passes,
+            "progress": {"done": self.done, "total": self.total, "failed": self.failed},
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "refreshed_hot_payloads": self.refreshed,
+            "skipped_route_busy": self.skipped_busy,
+            "refresh_interval_seconds": self.interval,
+            "hot_window_seconds": self.hot_window,
+            "max_builds_per_second": self.rate,
+        }
+
+cache_warmer = CacheWarmer(WARMUP_CONCURRENCY, WARMUP_REFRESH_INTERVAL, WARMUP_RATE, WARMUP_HOT_WINDOW)
+
+@app.on_event("startup")
+async def start_cache_warmer():
+    if WARMUP_ENABLED:
+        cache_warmer.start()
+
+@app.on_event("shutdown")
+async def stop_cache_warmer():
+    await cache_warmer.stop()
+
+# Administración
+# Índices derivados que se pueden inspeccionar e invalidar junto con las cachés del catálogo
+def derived_indexes():
+    return {
+        "level_index": level_index,
+        "stats_store": stats_store,
+        "teacher_index": teacher_index,
+        "profile_resolver": profile_resolver,
+    }
+
+@app.get("/api/admin/cache", dependencies=[Depends(verify_admin_key)])
+def get_cache_status():
+    """Estado de las cachés del catálogo (entradas, aciertos, fallos, expulsiones), de los índices derivados y de los payloads"""
+    status = {name: cache.stats() for name, cache in catalog_caches.items()}
+    status.update({name: index.stats() for name, index in derived_indexes().items()})
+    status["payloads"] = payload_cache.stats()
+    return status
+
+@app.get("/api/admin/cache/invalidate", dependencies=[Depends(verify_admin_key)])
+async def invalidate_cache(name: Optional[str] = Query(None), key: Optional[int] = Query(None)):
+    """Invalidar las cachés del catálogo: todas, una (`name`) o una entrada concreta (`name` + `key`).
+    Los índices derivados se reconstruyen en la siguiente consulta que los use. `name=payloads`
+    vacía la caché de reportes/assessments/charts (en Redis, para todos los workers).
+    """
+    indexes = derived_indexes()
+    if name is not None and name not in catalog_caches and name not in indexes and name != "payloads":
+        raise HTTPException(status_code=404, detail=f"Caché '{name}' no existe")
+    removed = {}
+    for cache_name, cache in catalog_caches.items():
+        if name in (None, cache_name):
+            removed[cache_name] = cache.invalidate(key if name else None)
+    for index_name, index in indexes.items():
+        if name in (None, index_name):
+            index.invalidate()
+            removed[index_name] = True
+    if name in (None, "payloads"):
+        removed["payloads"] = await payload_cache.clear()
+    return {"invalidated": removed}
+
+@app.get("/api/admin/stream", dependencies=[Depends(verify_admin_key)])
+def get_stream_status():
+    """Clientes conectados a /api/outcome-stream, outcomes vigilados y comprobaciones realizadas"""
+    return outcome_stream.stats()
+
 if __name__ == "__main__":
     import uvicorn
     import os
@@ -0,0 +1,84 @@
+# Prueba de carga: /health y /api/outcomes no deben esperar a que termine un reporte
+
+import requests
+import statistics
+import threading
+import time
+
+# Configuración
+BASE_URL = "http://localhost:8000"
+API_KEY = "tu_api_key_aqui"  # Cambia esto por tu API key real
+OUTCOME_ID = 1  # ID del outcome cuyo reporte se genera en paralelo
+REPORT_CLIENTS = 4  # Reportes simultáneos
+DURATION = 10  # Segundos de prueba
+
+headers = {
+    "X-API-Key": API_KEY
+}
+
+def report_worker(stop, durations):
+    """Pedir reportes en bucle hasta que termine la prueba"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        requests.get(f"{BASE_URL}/api/outcome-report/{OUTCOME_ID}", headers=headers)
+        durations.append(time.perf_counter() - start)
+
+def probe(path, stop, durations):
+    """Medir la latencia de un endpoint ligero mientras se generan reportes"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        requests.get(f"{BASE_URL}{path}", headers=headers)
+        durations.append(time.perf_counter() - start)
+        time.sleep(0.05)
+
+def summarize(name, durations):
+    if not durations:
+        print(f"   - {name}: sin datos")
+        return
+    ordered = sorted(durations)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(f"   - {name}: {len(ordered)} peticiones, "
+          f"mediana {statistics.median(ordered) * 1000:.1f} ms, "
+          f"p95 {p95 * 1000:.1f} ms, máx {ordered[-1] * 1000:.1f} ms")
+
+def run(with_reports):
+    stop = threading.Event()
+    reports, health, outcomes = [], [], []
+    threads = [
+        threading.Thread(target=probe, args=("/health", stop, health)),
+        threading.Thread(target=probe, args=("/api/outcomes", stop, outcomes)),
+    ]
+    if with_reports:
+        threads += [threading.Thread(target=report_worker, args=(stop, reports)) for _ in range(REPORT_CLIENTS)]
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+    if with_reports:
+        summarize(f"/api/outcome-report/{OUTCOME_ID}", reports)
+    summarize("/health", health)
+    summarize("/api/outcomes", outcomes)
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  TEST: Concurrencia de reportes vs. endpoints ligeros")
+    print("=" * 60)
+    print()
+
+    try:
+        print("🔍 Línea base (sin reportes en paralelo)...")
+        run(with_reports=False)
+        print()
+        print(f"🔍 Con {REPORT_CLIENTS} reportes en paralelo...")
+        run(with_reports=True)
+        print()
+        print("Si la latencia de /health y /api/outcomes se mantiene cercana a la línea base,")
+        print("los reportes no están bloqueando el event loop.")
+    except requests.exceptions.ConnectionError:
+        print("❌ No se pudo conectar al servidor")
+        print("   Ejecuta: uvicorn main:app --reload")
+
+    print()
+    print("=" * 60)
@@ -0,0 +1,121 @@
+# Prueba del backend Redis de la caché de payloads: dos "workers" (dos PayloadCache que
+# comparten el mismo Redis) deben calcular cada payload una sola vez por versión de datos.
+# Requiere un Redis accesible en REDIS_URL (o `pip install fakeredis` para probar sin servidor).
+# No consulta la BD: la versión de datos se simula.
+
+import asyncio
+import secrets
+import time
+
+import redis.asyncio as redis_asyncio
+from redis.exceptions import RedisError
+
+import main
+
+LOADER_DELAY = 0.3  # Segundos que tarda el cálculo simulado
+CLIENTS_PER_WORKER = 5  # Peticiones simultáneas por worker
+
+class FakeDataVersion:
+    """Sustituye a `main.data_version` para mover la versión a voluntad"""
+
+    def __init__(self):
+        self.evaluations = "1.1"
+
+    async def get(self):
+        return self.evaluations, "catalog"
+
+def redis_client(use_fake):
+    if use_fake:
+        import fakeredis
+        return fakeredis.FakeAsyncRedis()
+    return redis_asyncio.from_url(main.REDIS_URL)
+
+def new_worker(backend):
+    return main.PayloadCache(backend, ttl=60, stale_ttl=300, lock_ttl=5, wait=5)
+
+async def check_single_flight(workers, calls):
+    """Todas las peticiones de ambos workers comparten un único cálculo"""
+    async def loader(outcome_id):
+        calls.append(outcome_id)
+        await asyncio.sleep(LOADER_DELAY)
+        return {"outcome_id": outcome_id, "build": len(calls)}
+
+    results = await asyncio.gather(*[
+        worker.get_or_build(None, "report:1?", loader, 1)
+        for worker in workers for _ in range(CLIENTS_PER_WORKER)
+    ])
+    ok = len(calls) == 1 and all(result == results[0] for result in results)
+    print(f"   {'✅' if ok else '❌'} {len(results)} peticiones, {len(calls)} cálculo(s)")
+    return ok, loader
+
+async def check_version_change(workers, calls, loader, data_version):
+    """Con una versión nueva se recalcula una vez; el otro worker sirve la anterior sin esperar"""
+    data_version.evaluations = "2.2"
+    before = len(calls)
+    await asyncio.gather(
+        workers[0].get_or_build(None, "report:1?", loader, 1),
+        workers[1].get_or_build(None, "report:1?", loader, 1),
+    )
+    fresh = await workers[1].get_or_build(None, "report:1?", loader, 1)
+    ok = len(calls) - before == 1 and fresh["build"] == len(calls) and workers[1].stale_served == 1
+    print(f"   {'✅' if ok else '❌'} {len(calls) - before} cálculo(s) tras el cambio de versión, "
+          f"{workers[1].stale_served} respuesta(s) con la versión anterior")
+    return ok
+
+async def check_lock_released(backend):
+    locked = await backend.locked("report:1?")
+    print(f"   {'✅' if not locked else '❌'} candado liberado")
+    return not locked
+
+async def check_clear(workers, backend):
+    removed = await workers[0].clear()
+    entry = await backend.get("report:1?")
+    ok = removed >= 1 and entry is None
+    print(f"   {'✅' if ok else '❌'} {removed} clave(s) borradas con el prefijo {backend.prefix}")
+    return ok
+
+async def run(use_fake):
+    client = redis_client(use_fake)
+    await client.ping()
+    # Prefijo propio para no tocar las claves de un servidor en uso
+    backend = main.RedisCacheBackend(client, f"abet-test:{secrets.token_hex(4)}:")
+    data_version = FakeDataVersion()
+    main.data_version = data_version
+    workers = [new_worker(backend), new_worker(backend)]
+    calls = []
+
+    try:
+        print("🔍 Un cálculo para dos workers...")
+        ok, loader = await check_single_flight(workers, calls)
+        print("🔍 Cambio de versión de datos...")
+        ok = await check_version_change(workers, calls, loader, data_version) and ok
+        ok = await check_lock_released(backend) and ok
+        print("🔍 Invalidación...")
+        ok = await check_clear(workers, backend) and ok
+        return ok
+    finally:
+        await workers[0].clear()
+        await client.aclose()
+
+if __name__ == "__main__":
+    import sys
+
+    print("=" * 60)
+    print("  TEST: Caché de payloads en Redis")
+    print("=" * 60)
+    print()
+
+    use_fake = "--fake" in sys.argv
+    start = time.perf_counter()
+    try:
+        ok = asyncio.run(run(use_fake))
+        print()
+        print(f"{'✅ Todo correcto' if ok else '❌ Hay fallos'} ({time.perf_counter() - start:.1f} s)")
+    except ImportError:
+        print("❌ --fake requiere el paquete fakeredis: pip install fakeredis")
+    except RedisError as e:
+        print(f"❌ No se pudo conectar a Redis en {main.REDIS_URL}: {e}")
+        print("   Ejecuta: docker run -p 6379:6379 redis (o usa --fake)")
+
+    print()
+    print("=" * 60)
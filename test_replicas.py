@@ -0,0 +1,65 @@
+# Prueba de las réplicas de lectura: las agregaciones deben repartirse entre las réplicas
+# configuradas en DB_REPLICA_HOSTS y volver al primario cuando ninguna está disponible.
+# Ver "Réplicas de lectura" en el README para levantar dos instancias MySQL locales.
+
+import requests
+
+# Configuración
+BASE_URL = "http://localhost:8000"
+API_KEY = "tu_api_key_aqui"  # Cambia esto por tu API key real
+OUTCOME_ID = 1  # ID del outcome cuyas agregaciones se piden
+REQUESTS = 10  # Peticiones por endpoint pesado
+
+headers = {
+    "X-API-Key": API_KEY
+}
+
+def replica_stats():
+    response = requests.get(f"{BASE_URL}/api/db-pool", headers=headers)
+    response.raise_for_status()
+    return response.json().get("read_replicas")
+
+def check_replica_routing():
+    """Pedir assessments y charts y comparar los contadores de cada réplica"""
+    before = replica_stats()
+    if before is None:
+        print("⚠️  No hay réplicas configuradas (DB_REPLICA_HOSTS vacío)")
+        return False
+
+    for i in range(REQUESTS):
+        for path in (f"/api/outcome-assessment/{OUTCOME_ID}", f"/api/outcome-chart/{OUTCOME_ID}"):
+            # Un filtro distinto en cada petición evita la caché de payloads
+            requests.get(f"{BASE_URL}{path}", params={"from": i}, headers=headers)
+    requests.get(f"{BASE_URL}/api/outcomes", headers=headers)
+
+    after = replica_stats()
+    print(f"   Estrategia: {after['strategy']}, retraso máximo: {after['max_lag_seconds']} s")
+    routed = 0
+    for old, new in zip(before["replicas"], after["replicas"]):
+        delta = new["routed"] - old["routed"]
+        routed += delta
+        state = "✅" if new["usable"] else "❌"
+        print(f"   {state} {new['name']}: {delta} conexiones, retraso {new['lag_seconds']} s"
+              + (f", error: {new['error']}" if new["error"] else ""))
+    fallbacks = after["fallbacks_to_primary"] - before["fallbacks_to_primary"]
+    print(f"   Primario (respaldo): {fallbacks} conexiones")
+    return routed > 0 or fallbacks > 0
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  TEST: Réplicas de lectura")
+    print("=" * 60)
+    print()
+
+    try:
+        print("🔍 Repartiendo agregaciones...")
+        if check_replica_routing():
+            print()
+            print("Apaga una réplica (o supera DB_REPLICA_MAX_LAG) y repite: sus conexiones")
+            print("deben pasar a las demás réplicas o al primario sin errores.")
+    except requests.exceptions.ConnectionError:
+        print("❌ No se pudo conectar al servidor")
+        print("   Ejecuta: uvicorn main:app --reload")
+
+    print()
+    print("=" * 60)